@@ -13,8 +13,11 @@ class Settings(BaseSettings):
         extra="ignore"  # Ignore extra variables in .env file
     )
     
-    # Database configuration (JSON file storage)
-    # Data is stored in data/users.json and data/transactions.json
+    # Database configuration
+    # "json": data/users.json and data/transactions.jsonl (default)
+    # "sqlite": a single SQLite database in WAL mode at sqlite_path
+    storage_backend: str = "json"
+    sqlite_path: str = "data/finwise.db"
     
     # Gemini configuration
     gemini_api_key: Optional[str] = None
@@ -23,9 +26,60 @@ class Settings(BaseSettings):
     # Ollama configuration (fallback)
     ollama_url: str = "http://localhost:11434"
     ollama_model: str = "llama3"
+    # Concurrent requests sent to Ollama; match the server's OLLAMA_NUM_PARALLEL
+    ollama_num_parallel: int = 4
+    # Seconds to wait for Gemini before also starting the Ollama fallback
+    llm_hedge_delay: float = 2.0
+    
+    # Output token caps for Gemini (max_output_tokens) and Ollama (num_predict).
+    # The JSON replies are well under these; gemini-2.5 models also spend
+    # thinking tokens from this budget, so don't cut them much lower.
+    extraction_max_output_tokens: int = 512
+    coaching_max_output_tokens: int = 1024
+    
+    # LLM response cache (semantic lookup needs faiss-cpu and sentence-transformers)
+    llm_cache_enabled: bool = True
+    llm_cache_dir: str = "data/llm_cache"
+    llm_cache_similarity: float = 0.92
+    llm_cache_max_entries: int = 10000
+    llm_cache_embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
     
     # Whisper configuration
     whisper_model_size: str = "medium"
+    # Load the model at startup instead of on the first audio request
+    whisper_preload: bool = True
+    # Directory holding downloaded weights (empty: the library default,
+    # e.g. ~/.cache/whisper); point it at weights baked into the image to
+    # skip the download on a cold start
+    whisper_cache_dir: str = ""
+    # "cpu", "cuda", ...; empty picks CUDA when available
+    whisper_device: str = ""
+    # "openai" (openai-whisper), "faster_whisper" (CTranslate2, needs
+    # faster-whisper) or "onnx" (int8 ONNX Runtime, needs the onnx extra)
+    whisper_backend: str = "openai"
+    # "int8" | "int8_float16" | "float16" | "float32"; for the openai backend
+    # int8 means dynamic int8 quantization of the linear layers on CPU
+    whisper_compute_type: str = "int8"
+    # Drop silence with Silero VAD before transcribing (built into
+    # faster-whisper; the other backends need the vad extra)
+    whisper_vad: bool = True
+    # openai backend: clips (up to 30 s) arriving within the window are
+    # transcribed together, up to batch_size at a time; 1 disables batching
+    whisper_batch_size: int = 8
+    whisper_batch_window_ms: int = 25
+    # Spoken language code (e.g. "hi", "en"); empty to auto-detect per request
+    whisper_language: str = ""
+    # Largest audio upload accepted, in bytes
+    whisper_max_bytes: int = 25 * 1024 * 1024
+    # CPU threads for inference (0: every core available to the process)
+    whisper_threads: int = 0
+    # openai backend: torch.compile the audio encoder (slower first request)
+    whisper_compile: bool = False
+    # Directory for audio that has to go through a temp file; empty uses
+    # /dev/shm when writable, else the system temp dir
+    whisper_tmp_dir: str = ""
+    # Where the onnx backend keeps its exported, quantized models
+    whisper_onnx_dir: str = "data/whisper_onnx"
 
 
 settings = Settings()
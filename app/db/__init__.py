@@ -1,20 +1,27 @@
 """Database setup."""
 from app.db.db import (
     init_db,
+    db_initialized,
     get_user,
     get_all_users,
     create_user,
     update_user,
     get_transactions,
     create_transaction,
+    create_transactions,
 )
+from app.db.request_cache import RequestDB, get_db
 
 __all__ = [
     "init_db",
+    "db_initialized",
     "get_user",
     "get_all_users",
     "create_user",
     "update_user",
     "get_transactions",
     "create_transaction",
+    "create_transactions",
+    "RequestDB",
+    "get_db",
 ]
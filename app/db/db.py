@@ -1,14 +1,22 @@
-"""Database setup for JSON storage."""
-from app.db.json_storage import init_db, get_user, get_all_users, create_user, update_user
-from app.db.json_storage import get_transactions, create_transaction
+"""Database setup: selects the JSON or SQLite storage backend."""
+from app.config import settings
+
+if settings.storage_backend == "sqlite":
+    from app.db.sqlite_storage import init_db, db_initialized, get_user, get_all_users, create_user, update_user
+    from app.db.sqlite_storage import get_transactions, create_transaction, create_transactions
+else:
+    from app.db.json_storage import init_db, db_initialized, get_user, get_all_users, create_user, update_user
+    from app.db.json_storage import get_transactions, create_transaction, create_transactions
 
 # Re-export for compatibility
 __all__ = [
     "init_db",
+    "db_initialized",
     "get_user",
     "get_all_users",
     "create_user",
     "update_user",
     "get_transactions",
     "create_transaction",
+    "create_transactions",
 ]
@@ -1,18 +1,48 @@
 """JSON-based storage for users and transactions."""
-import json
+import heapq
+import mmap
 import os
+import orjson
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from datetime import date, datetime
-from threading import Lock
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Callable, TypeVar
+from datetime import date
+from app.db.rwlock import RWLock
+
+T = TypeVar("T")
 
 # Data directory
 DATA_DIR = Path("data")
 USERS_FILE = DATA_DIR / "users.json"
-TRANSACTIONS_FILE = DATA_DIR / "transactions.json"
+# Transactions are an append-only log with one JSON object per line
+TRANSACTIONS_FILE = DATA_DIR / "transactions.jsonl"
+# Pre-JSONL transactions file, migrated by init_db
+LEGACY_TRANSACTIONS_FILE = DATA_DIR / "transactions.json"
+
+# Files at least this large are parsed straight from a read-only mmap; below
+# it a plain read is cheaper than setting up the mapping
+MMAP_THRESHOLD = 64 * 1024
+
+# Per-file reader-writer locks: cache hits share the read side, while saves,
+# appends and cache reloads take the write side of their own file only
+_locks: Dict[Path, RWLock] = {
+    USERS_FILE: RWLock(),
+    TRANSACTIONS_FILE: RWLock(),
+    LEGACY_TRANSACTIONS_FILE: RWLock(),
+}
+
+# Parsed file contents keyed by path, tagged with the (mtime_ns, size) stamp
+# they were read at so external edits to the files still invalidate them
+_cache: Dict[Path, Tuple[Tuple[int, int], List[Dict[str, Any]]]] = {}
+
+# Secondary index over the cached users list (id -> user)
+_users_by_id: Dict[int, Dict[str, Any]] = {}
 
-# Thread lock for file operations
-_file_lock = Lock()
+# Secondary index over the cached transactions (user_id -> rows)
+_transactions_by_user: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+
+# Highest id seen per cached file, so appends don't rescan for the next id
+_max_ids: Dict[Path, int] = {}
 
 
 def _ensure_data_dir():
@@ -20,46 +50,279 @@ def _ensure_data_dir():
     DATA_DIR.mkdir(exist_ok=True)
 
 
+def _stat_stamp(file_path: Path) -> Tuple[int, int]:
+    """Return the (mtime_ns, size) stamp used to validate cached file contents."""
+    st = file_path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _parse_transaction_date(t: Dict[str, Any]):
+    """Convert a stored ISO date string to a date object in place."""
+    if isinstance(t.get("date"), str):
+        try:
+            t["date"] = date.fromisoformat(t["date"])
+        except ValueError:
+            t["date"] = date.today()
+
+
+def _index_rows(file_path: Path, rows: List[Dict[str, Any]]):
+    """Add rows to the secondary indexes for their file. Caller holds the file's write lock."""
+    if file_path == USERS_FILE:
+        for user in rows:
+            _users_by_id[user.get("id")] = user
+    elif file_path == TRANSACTIONS_FILE:
+        for t in rows:
+            _parse_transaction_date(t)
+            _transactions_by_user[t.get("user_id")].append(t)
+
+
+def _clear_indexes(file_path: Path):
+    """Empty the secondary indexes for a file. Caller holds the file's write lock."""
+    if file_path == USERS_FILE:
+        _users_by_id.clear()
+    elif file_path == TRANSACTIONS_FILE:
+        _transactions_by_user.clear()
+
+
+def _set_cache(
+    file_path: Path,
+    stamp: Tuple[int, int],
+    data: List[Dict[str, Any]],
+    max_id: Optional[int] = None
+):
+    """Store parsed file contents and rebuild dependent indexes. Caller holds the file's write lock."""
+    _cache[file_path] = (stamp, data)
+    if max_id is None:
+        max_id = max((row.get("id", 0) for row in data), default=0)
+    _max_ids[file_path] = max_id
+    _clear_indexes(file_path)
+    _index_rows(file_path, data)
+
+
+def _drop_cache(file_path: Path):
+    """Forget cached contents for a file. Caller holds the file's write lock."""
+    _cache.pop(file_path, None)
+    _max_ids.pop(file_path, None)
+    _clear_indexes(file_path)
+
+
+def _parse(file_path: Path, raw) -> List[Dict[str, Any]]:
+    """Parse a .json array or a .jsonl log from a bytes-like buffer."""
+    # The view is released on exit so a backing mmap can be closed afterwards
+    with memoryview(raw) as view:
+        if file_path.suffix != ".jsonl":
+            return orjson.loads(view)
+        
+        rows = []
+        start = 0
+        size = len(view)
+        while start < size:
+            end = raw.find(b"\n", start)
+            if end == -1:
+                end = size
+            try:
+                # Slicing the view hands orjson each line without copying it
+                rows.append(orjson.loads(view[start:end]))
+            except orjson.JSONDecodeError:
+                # Skip blank lines and a torn trailing line left by an interrupted append
+                pass
+            start = end + 1
+        return rows
+
+
+def _read_rows(file_path: Path, size: int) -> List[Dict[str, Any]]:
+    """Read and parse a file, mapping it into memory when it is large."""
+    if size == 0:
+        # init_db creates empty files; treat them as empty lists
+        return []
+    if size < MMAP_THRESHOLD:
+        return _parse(file_path, file_path.read_bytes())
+    
+    with open(file_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _parse(file_path, mm)
+    finally:
+        mm.close()
+
+
+def _load_locked(file_path: Path) -> Optional[List[Dict[str, Any]]]:
+    """Return the cached rows for a file, re-reading it if it changed. Caller holds the file's write lock."""
+    try:
+        stamp = _stat_stamp(file_path)
+    except OSError:
+        _drop_cache(file_path)
+        return None
+    
+    cached = _cache.get(file_path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    
+    try:
+        data = _read_rows(file_path, stamp[1])
+    except (orjson.JSONDecodeError, IOError):
+        _drop_cache(file_path)
+        return None
+    
+    _set_cache(file_path, stamp, data)
+    return data
+
+
+def _read_cached(file_path: Path, view: Callable[[Optional[List[Dict[str, Any]]]], T]) -> T:
+    """
+    Apply view to a file's up-to-date cached rows (None if unreadable).
+    
+    Cache hits run under the shared read lock; a stale or missing cache is
+    reloaded under the write lock, which re-checks the stamp first.
+    """
+    lock = _locks[file_path]
+    with lock.read():
+        cached = _cache.get(file_path)
+        try:
+            fresh = cached is not None and cached[0] == _stat_stamp(file_path)
+        except OSError:
+            fresh = False
+        if fresh:
+            return view(cached[1])
+    
+    with lock.write():
+        return view(_load_locked(file_path))
+
+
+def _copy_row(row: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Copy a cached row before handing it out, so callers cannot edit the cache."""
+    return None if row is None else dict(row)
+
+
 def _load_json(file_path: Path, default: List = None) -> List[Dict[str, Any]]:
-    """Load JSON data from file."""
+    """Load JSON data from file, reusing the parsed contents while the file is unchanged."""
     if default is None:
         default = []
     
-    if not file_path.exists():
-        return default
-    
+    # Copy the rows too so callers can edit them without touching the cache
+    data = _read_cached(file_path, lambda rows: None if rows is None else [dict(row) for row in rows])
+    return default if data is None else data
+
+
+def _write_all(fd: int, payload: bytes):
+    """Write payload to fd, normally in a single write(2)."""
+    view = memoryview(payload)
+    while view:
+        # Loop only guards against short writes
+        view = view[os.write(fd, view):]
+
+
+def _write_atomic(file_path: Path, payload: bytes):
+    """Write payload to a temp file in one write and rename it over file_path."""
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return default
+        _write_all(fd, payload)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, file_path)
+
+
+def _save_locked(file_path: Path, data: List[Dict[str, Any]], max_id: Optional[int] = None):
+    """Write data to file and refresh the cached copy. Caller holds the file's write lock."""
+    # orjson serializes date/datetime natively as ISO-8601
+    payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    _ensure_data_dir()
+    _write_atomic(file_path, payload)
+    _set_cache(file_path, _stat_stamp(file_path), list(data), max_id=max_id)
 
 
 def _save_json(file_path: Path, data: List[Dict[str, Any]]):
-    """Save JSON data to file."""
-    with _file_lock:
+    """Save JSON data to file and refresh the cached copy."""
+    with _locks[file_path].write():
+        _save_locked(file_path, data)
+
+
+def _append_jsonl(file_path: Path, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Assign ids to rows and append them to a JSONL log without rewriting it."""
+    with _locks[file_path].write():
         _ensure_data_dir()
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, default=str)
+        existing = _load_locked(file_path)
+        if existing is None:
+            if file_path.exists():
+                # Ids would restart at 1 and duplicate the ones already in the log
+                raise IOError(f"Cannot read {file_path}; not appending to it")
+            existing = []
+            _set_cache(file_path, (0, 0), existing)
+        
+        next_id = _max_ids.get(file_path, 0)
+        for row in rows:
+            next_id += 1
+            row["id"] = next_id
+        # Cache copies, so later edits to the caller's dicts stay out of the cache
+        rows = [dict(row) for row in rows]
+        
+        payload = b"".join(orjson.dumps(row) + b"\n" for row in rows)
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                # Terminate a torn trailing line so the new rows parse on their own
+                payload = b"\n" + payload
+            _write_all(fd, payload)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        
+        # Extend the cache and indexes in place rather than re-reading the log
+        existing.extend(rows)
+        _cache[file_path] = (_stat_stamp(file_path), existing)
+        _max_ids[file_path] = next_id
+        _index_rows(file_path, rows)
+    return [dict(row) for row in rows]
+
+
+def _migrate_legacy_transactions():
+    """Convert a pre-JSONL transactions.json into the append-only log."""
+    if TRANSACTIONS_FILE.exists() or not LEGACY_TRANSACTIONS_FILE.exists():
+        return
+    
+    transactions = _load_json(LEGACY_TRANSACTIONS_FILE, [])
+    payload = b"".join(orjson.dumps(t) + b"\n" for t in transactions)
+    with _locks[TRANSACTIONS_FILE].write():
+        _write_atomic(TRANSACTIONS_FILE, payload)
+    with _locks[LEGACY_TRANSACTIONS_FILE].write():
+        _drop_cache(LEGACY_TRANSACTIONS_FILE)
+    LEGACY_TRANSACTIONS_FILE.rename(
+        LEGACY_TRANSACTIONS_FILE.with_name(LEGACY_TRANSACTIONS_FILE.name + ".migrated")
+    )
+
+
+def db_initialized() -> bool:
+    """Check whether init_db has already created the data files."""
+    # Once transactions.jsonl exists there is nothing left to migrate
+    return USERS_FILE.exists() and TRANSACTIONS_FILE.exists()
+
+
+def _create_if_missing(file_path: Path):
+    """Create an empty file unless it already exists, without touching its times."""
+    try:
+        os.close(os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+    except FileExistsError:
+        pass
 
 
 def init_db():
     """Initialize database by creating data directory and empty files if needed."""
     _ensure_data_dir()
-    if not USERS_FILE.exists():
-        _save_json(USERS_FILE, [])
-    if not TRANSACTIONS_FILE.exists():
-        _save_json(TRANSACTIONS_FILE, [])
+    # Only missing files are created (an empty file reads as []); existing
+    # ones keep their mtime so the parsed-file caches stay valid
+    _create_if_missing(USERS_FILE)
+    _migrate_legacy_transactions()
+    _create_if_missing(TRANSACTIONS_FILE)
 
 
 # User operations
 def get_user(user_id: int) -> Optional[Dict[str, Any]]:
     """Get user by ID."""
-    users = _load_json(USERS_FILE, [])
-    for user in users:
-        if user.get("id") == user_id:
-            return user
-    return None
+    # Refreshes the cache (and the id index with it) if the file changed
+    return _read_cached(USERS_FILE, lambda rows: _copy_row(_users_by_id.get(user_id)))
 
 
 def get_all_users() -> List[Dict[str, Any]]:
@@ -69,75 +332,87 @@ def get_all_users() -> List[Dict[str, Any]]:
 
 def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new user."""
-    users = _load_json(USERS_FILE, [])
-    
-    # Generate new ID
-    if users:
-        new_id = max(u.get("id", 0) for u in users) + 1
-    else:
-        new_id = 1
-    
-    user_data["id"] = new_id
-    users.append(user_data)
-    _save_json(USERS_FILE, users)
+    # Read, assign the id and save under one write lock so concurrent
+    # creates cannot hand out the same id
+    with _locks[USERS_FILE].write():
+        users = _load_locked(USERS_FILE)
+        users = [] if users is None else list(users)
+        
+        # Next ID comes from the cached max id instead of a scan
+        new_id = _max_ids.get(USERS_FILE, 0) + 1
+        
+        user_data["id"] = new_id
+        users.append(dict(user_data))
+        _save_locked(USERS_FILE, users, max_id=new_id)
     return user_data
 
 
 def update_user(user_id: int, user_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update user by ID."""
-    users = _load_json(USERS_FILE, [])
-    for i, user in enumerate(users):
-        if user.get("id") == user_id:
-            user_data["id"] = user_id
-            users[i] = user_data
-            _save_json(USERS_FILE, users)
-            return user_data
-    return None
+    # Look up, replace and save under one write lock so a concurrent
+    # create_user cannot be overwritten
+    with _locks[USERS_FILE].write():
+        users = _load_locked(USERS_FILE)
+        existing = _users_by_id.get(user_id)
+        if users is None or existing is None:
+            return None
+        
+        user_data["id"] = user_id
+        # The indexed dict is the same object as its list entry, so swap it
+        # by identity while copying instead of searching with list.index
+        replacement = dict(user_data)
+        users = [replacement if u is existing else u for u in users]
+        _save_locked(USERS_FILE, users, max_id=_max_ids.get(USERS_FILE))
+    return user_data
 
 
 # Transaction operations
-def get_transactions(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
-    """Get all transactions, optionally filtered by user_id."""
-    transactions = _load_json(TRANSACTIONS_FILE, [])
-    
-    # Convert date strings back to date objects for compatibility
-    for t in transactions:
-        if isinstance(t.get("date"), str):
-            try:
-                t["date"] = datetime.strptime(t["date"], "%Y-%m-%d").date()
-            except ValueError:
-                t["date"] = date.today()
+def _load_user_transactions(user_id: int) -> List[Dict[str, Any]]:
+    """Return copies of one user's cached transactions via the user_id index."""
+    return _read_cached(
+        TRANSACTIONS_FILE,
+        lambda rows: [] if rows is None else [dict(t) for t in _transactions_by_user.get(user_id, ())]
+    )
+
+
+def _transaction_date_key(t: Dict[str, Any]) -> date:
+    """Sort key for transactions (by date)."""
+    return t.get("date", date.min)
+
+
+def get_transactions(user_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Get transactions newest first, optionally filtered by user_id.
     
+    With limit, only the newest `limit` rows are selected (O(N log limit))
+    instead of sorting every row.
+    """
     if user_id is not None:
-        transactions = [t for t in transactions if t.get("user_id") == user_id]
+        # Only this user's rows are touched below, not the whole log
+        transactions = _load_user_transactions(user_id)
+    else:
+        transactions = _load_json(TRANSACTIONS_FILE, [])
+    
+    # Dates were already converted to date objects once, when the rows were cached
+    if limit is not None and limit < len(transactions):
+        if limit <= 0:
+            return []
+        if limit == 1:
+            return [max(transactions, key=_transaction_date_key)]
+        return heapq.nlargest(limit, transactions, key=_transaction_date_key)
     
     # Sort by date descending
-    transactions.sort(key=lambda x: x.get("date", date.min), reverse=True)
+    transactions.sort(key=_transaction_date_key, reverse=True)
     return transactions
 
 
 def create_transaction(transaction_data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new transaction."""
-    transactions = _load_json(TRANSACTIONS_FILE, [])
-    
-    # Generate new ID
-    if transactions:
-        new_id = max(t.get("id", 0) for t in transactions) + 1
-    else:
-        new_id = 1
-    
-    transaction_data["id"] = new_id
-    
-    # Convert date to string for JSON storage
-    if isinstance(transaction_data.get("date"), date):
-        transaction_data["date"] = transaction_data["date"].isoformat()
-    
-    transactions.append(transaction_data)
-    _save_json(TRANSACTIONS_FILE, transactions)
-    
-    # Convert date back to date object for return
-    if isinstance(transaction_data.get("date"), str):
-        transaction_data["date"] = datetime.strptime(transaction_data["date"], "%Y-%m-%d").date()
-    
-    return transaction_data
+    return create_transactions([transaction_data])[0]
+
 
+def create_transactions(transactions_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Create several transactions with a single append to the log."""
+    # Dates stay date objects in memory; orjson writes them as YYYY-MM-DD.
+    # One line per row is appended and ids come from the cached max id
+    return _append_jsonl(TRANSACTIONS_FILE, transactions_data)
@@ -0,0 +1,47 @@
+"""Per-request memoization of storage reads."""
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import Request
+from app.db.db import get_user, get_transactions, create_transactions
+
+
+class RequestDB:
+    """Storage view for a single request that loads each record set at most once."""
+
+    def __init__(self):
+        """Initialize empty per-request caches."""
+        self._users: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._transactions: Dict[Tuple[Optional[int], Optional[int]], List[Dict[str, Any]]] = {}
+
+    def user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get user by ID, loading it on first access."""
+        if user_id not in self._users:
+            self._users[user_id] = get_user(user_id)
+        return self._users[user_id]
+
+    def transactions(self, user_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get newest-first transactions (optionally for one user), loading them on first access."""
+        key = (user_id, limit)
+        if key not in self._transactions:
+            full = self._transactions.get((user_id, None))
+            if full is not None:
+                # Already have every row for this user; the newest come first
+                # (a non-positive limit selects nothing, as in get_transactions)
+                self._transactions[key] = full[:max(limit, 0)]
+            else:
+                self._transactions[key] = get_transactions(user_id=user_id, limit=limit)
+        return self._transactions[key]
+
+    def create_transactions(self, transactions_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create transactions and drop cached transaction lists they make stale."""
+        created = create_transactions(transactions_data)
+        self._transactions.clear()
+        return created
+
+
+async def get_db(request: Request) -> RequestDB:
+    """FastAPI dependency returning the request's memoized storage view."""
+    db = getattr(request.state, "_db_cache", None)
+    if db is None:
+        db = RequestDB()
+        request.state._db_cache = db
+    return db
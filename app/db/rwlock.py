@@ -0,0 +1,51 @@
+"""Reader-writer lock for the JSON storage files."""
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+
+class RWLock:
+    """
+    Lock allowing many concurrent readers or a single writer.
+
+    Waiting writers block new readers so a steady stream of reads cannot
+    starve a save. Not reentrant: a thread must not re-acquire either side
+    (or upgrade read to write) while holding the lock.
+    """
+
+    def __init__(self):
+        """Initialize an unlocked lock."""
+        self._cond = Condition(Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock shared for the duration of the block."""
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock exclusively for the duration of the block."""
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
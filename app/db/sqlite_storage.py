@@ -0,0 +1,180 @@
+"""SQLite-based storage for users and transactions."""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from datetime import date
+from app.config import settings
+
+# Database file
+DB_PATH = Path(settings.sqlite_path)
+
+# Columns stored for a user, in table order (id excluded)
+USER_COLUMNS = (
+    "name",
+    "risk_profile",
+    "goals",
+    "age_range",
+    "income_range",
+    "debt",
+    "emi",
+    "existing_savings",
+)
+
+# Columns stored for a transaction, in table order (id excluded)
+TRANSACTION_COLUMNS = ("user_id", "amount", "type", "tag", "category", "date")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    risk_profile TEXT,
+    goals TEXT,
+    age_range TEXT,
+    income_range TEXT,
+    debt REAL,
+    emi REAL,
+    existing_savings REAL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    amount NUMERIC NOT NULL,
+    type TEXT NOT NULL,
+    tag TEXT,
+    category TEXT,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tx_user_date ON transactions(user_id, date DESC);
+"""
+
+# One connection per thread: WAL lets readers on other connections run
+# alongside a writer, and sqlite3 connections must not be shared unguarded
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    """Get this thread's connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; write paths open their own transactions
+        conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    return conn
+
+
+def _transaction_row(row: sqlite3.Row) -> Dict[str, Any]:
+    """Convert a transactions row to a transaction dict with a date object."""
+    t = dict(row)
+    try:
+        t["date"] = date.fromisoformat(t["date"])
+    except ValueError:
+        t["date"] = date.today()
+    return t
+
+
+def db_initialized() -> bool:
+    """Check whether init_db has already created the tables and index."""
+    (count,) = _connect().execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name IN ('users', 'transactions', 'tx_user_date')"
+    ).fetchone()
+    return count == 3
+
+
+def init_db():
+    """Initialize database by creating the tables and index if needed."""
+    _connect().executescript(_SCHEMA)
+
+
+# User operations
+def get_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Get user by ID."""
+    row = _connect().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def get_all_users() -> List[Dict[str, Any]]:
+    """Get all users."""
+    rows = _connect().execute("SELECT * FROM users ORDER BY id").fetchall()
+    return [dict(row) for row in rows]
+
+
+def create_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Create a new user."""
+    cursor = _connect().execute(
+        f"INSERT INTO users ({', '.join(USER_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(USER_COLUMNS))})",
+        tuple(user_data.get(column) for column in USER_COLUMNS)
+    )
+    user_data["id"] = cursor.lastrowid
+    return user_data
+
+
+def update_user(user_id: int, user_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Update user by ID."""
+    # Replaces the whole record, like the JSON backend does
+    cursor = _connect().execute(
+        f"UPDATE users SET {', '.join(f'{column} = ?' for column in USER_COLUMNS)} WHERE id = ?",
+        tuple(user_data.get(column) for column in USER_COLUMNS) + (user_id,)
+    )
+    if cursor.rowcount == 0:
+        return None
+    user_data["id"] = user_id
+    return user_data
+
+
+# Transaction operations
+def get_transactions(user_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get transactions newest first, optionally filtered by user_id and limited to `limit` rows."""
+    # id breaks date ties in insertion order, matching the JSON backend;
+    # for a user_id filter this is served straight from tx_user_date
+    query = "SELECT * FROM transactions"
+    params: List[Any] = []
+    if user_id is not None:
+        query += " WHERE user_id = ?"
+        params.append(user_id)
+    query += " ORDER BY date DESC, id ASC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(max(limit, 0))
+
+    rows = _connect().execute(query, params).fetchall()
+    return [_transaction_row(row) for row in rows]
+
+
+def create_transaction(transaction_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Create a new transaction."""
+    return create_transactions([transaction_data])[0]
+
+
+def create_transactions(transactions_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Create several transactions in one write transaction (one WAL commit)."""
+    conn = _connect()
+    # IMMEDIATE takes the write lock up front so the ids below stay ours
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        next_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+        params = []
+        for transaction_data in transactions_data:
+            next_id += 1
+            transaction_data["id"] = next_id
+            t_date = transaction_data.get("date")
+            params.append(
+                (next_id,)
+                + tuple(transaction_data.get(column) for column in TRANSACTION_COLUMNS[:-1])
+                + (t_date.isoformat() if isinstance(t_date, date) else t_date,)
+            )
+        conn.executemany(
+            f"INSERT INTO transactions (id, {', '.join(TRANSACTION_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * (len(TRANSACTION_COLUMNS) + 1))})",
+            params
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return transactions_data
@@ -1,14 +1,35 @@
 """Main FastAPI application."""
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import settings
 from app.db.db import init_db
 from app.routers import nlp, coaching, users
+from app.services.whisper_service import whisper_service
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database and load the Whisper model on startup."""
+    init_db()
+    if settings.whisper_preload:
+        try:
+            await whisper_service.initialize()
+        except Exception:
+            # Keep serving text messages; audio requests retry the load
+            logger.exception("Failed to preload the Whisper model; audio transcription is unavailable until it loads")
+    yield
+
 
 # Create FastAPI app
 app = FastAPI(
     title="FinWise API",
     description="Financial coaching app backend with NLP and AI agents",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -26,12 +47,6 @@ app.include_router(nlp.router)
 app.include_router(coaching.router)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup."""
-    init_db()
-
-
 @app.get("/")
 async def root():
     """Root endpoint."""
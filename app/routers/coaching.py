@@ -1,9 +1,9 @@
 """Coaching router for financial advice."""
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import Dict, Any
-from app.db.db import get_user, get_transactions
-from app.models.transaction import Transaction
+from typing import Dict, Any, List, Tuple
+from app.db.request_cache import RequestDB, get_db
 from app.services.auditor import audit_finances
 from app.services.strategist import create_safety_plan
 from app.services.catalyst import propose_portfolio
@@ -39,26 +39,27 @@ def generate_conversational_summary(
     Returns:
         Conversational summary string
     """
-    # Get latest transaction details
-    transaction_type = latest_transaction.get("type", "expense")
-    amount = latest_transaction.get("amount", 0)
-    tag = latest_transaction.get("tag") or "transaction"
+    # Bind the lookups once; the f-strings below are compiled to bytecode
+    # already, so they beat re-parsing a str.format template on every call
+    transaction_get = latest_transaction.get
+    amount = transaction_get("amount", 0)
     
-    # Build message
-    message_parts = []
-    
-    if transaction_type == "income":
-        message_parts.append(f"Great job earning ₹{amount:.0f} today!")
+    if transaction_get("type", "expense") == "income":
+        opening = f"Great job earning ₹{amount:.0f} today!"
     else:
-        message_parts.append(f"You spent ₹{amount:.0f} on {tag}.")
+        tag = transaction_get("tag") or "transaction"
+        opening = f"You spent ₹{amount:.0f} on {tag}."
     
-    # Add burn rate
-    burn_rate = report.get("burn_rate", 0)
-    message_parts.append(f"Your burn rate this month is {burn_rate:.0f}%.")
+    # Opening line and burn rate are always present
+    message_parts = [
+        opening,
+        f"Your burn rate this month is {report.get('burn_rate', 0):.0f}%."
+    ]
     
     # Add savings plan
-    monthly_savings = plan.get("monthly_savings_target", 0)
-    months_to_goal = plan.get("months_to_reach_goal", 0)
+    plan_get = plan.get
+    monthly_savings = plan_get("monthly_savings_target", 0)
+    months_to_goal = plan_get("months_to_reach_goal", 0)
     if monthly_savings > 0 and months_to_goal > 0:
         message_parts.append(
             f"If you save ₹{monthly_savings:.0f}/month, "
@@ -68,54 +69,59 @@ def generate_conversational_summary(
     # Add portfolio suggestion
     portfolio = proposal.get("portfolio", {})
     if portfolio:
-        equity = portfolio.get("equity", 0)
-        debt = portfolio.get("debt", 0)
-        gold = portfolio.get("gold", 0)
-        cash = portfolio.get("cash", 0)
+        portfolio_get = portfolio.get
         message_parts.append(
-            f"Suggested portfolio: {equity}% equity, {debt}% debt, "
-            f"{gold}% gold, {cash}% cash."
+            f"Suggested portfolio: {portfolio_get('equity', 0)}% equity, "
+            f"{portfolio_get('debt', 0)}% debt, {portfolio_get('gold', 0)}% gold, "
+            f"{portfolio_get('cash', 0)}% cash."
         )
     
     return " ".join(message_parts)
 
 
-@router.post("/advise")
-def get_coaching_advice(request: CoachAdviseRequest):
+async def _fetch_user_and_transactions(
+    db: RequestDB,
+    user_id: int
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
     """
-    Get personalized financial coaching advice.
+    Fetch a user and their transactions concurrently in worker threads.
     
-    Pipeline:
-    1. Fetch user and latest transactions
-    2. Run auditor → strategist → catalyst
-    3. Return complete coaching response
+    Raises:
+        HTTPException: 404 if the user or their transactions are missing
     """
-    # Fetch user
-    user = get_user(request.user_id)
+    user, transactions_data = await asyncio.gather(
+        asyncio.to_thread(db.user, user_id),
+        asyncio.to_thread(db.transactions, user_id=user_id)
+    )
+    
     if not user:
         raise HTTPException(
             status_code=404,
-            detail=f"User with id {request.user_id} not found"
+            detail=f"User with id {user_id} not found"
         )
     
-    # Fetch user transactions
-    transactions_data = get_transactions(user_id=request.user_id)
-    
     if not transactions_data:
         raise HTTPException(
             status_code=404,
             detail="No transactions found for this user"
         )
     
-    # Convert to Transaction objects for auditor
-    transactions = [Transaction(**t) for t in transactions_data]
-    
-    # Get latest transaction
-    latest_transaction = transactions_data[0]
+    return user, transactions_data
+
+
+def _run_agents(
+    transactions_data: List[Dict[str, Any]],
+    risk_profile: str
+) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """
+    Run auditor → strategist → catalyst. Called via asyncio.to_thread.
     
-    # Run auditor
+    Returns:
+        Tuple of (report, plan, proposal)
+    """
+    # Run auditor on the storage dicts directly (no per-row model validation)
     try:
-        report = audit_finances(transactions)
+        report = audit_finances(transactions_data)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -124,7 +130,7 @@ def get_coaching_advice(request: CoachAdviseRequest):
     
     # Run strategist
     try:
-        plan = create_safety_plan(report, user["risk_profile"])
+        plan = create_safety_plan(report, risk_profile)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -133,13 +139,37 @@ def get_coaching_advice(request: CoachAdviseRequest):
     
     # Run catalyst
     try:
-        proposal = propose_portfolio(plan, user["risk_profile"])
+        proposal = propose_portfolio(plan, risk_profile)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to propose portfolio: {str(e)}"
         )
     
+    return report, plan, proposal
+
+
+@router.post("/advise")
+async def get_coaching_advice(request: CoachAdviseRequest, db: RequestDB = Depends(get_db)):
+    """
+    Get personalized financial coaching advice.
+    
+    Pipeline:
+    1. Fetch user and latest transactions
+    2. Run auditor → strategist → catalyst
+    3. Return complete coaching response
+    """
+    # Fetch user and transactions concurrently
+    user, transactions_data = await _fetch_user_and_transactions(db, request.user_id)
+    
+    # Get latest transaction
+    latest_transaction = transactions_data[0]
+    
+    # Run auditor → strategist → catalyst off the event loop
+    report, plan, proposal = await asyncio.to_thread(
+        _run_agents, transactions_data, user["risk_profile"]
+    )
+    
     # Generate conversational summary
     try:
         message = generate_conversational_summary(
@@ -178,7 +208,7 @@ def get_coaching_advice(request: CoachAdviseRequest):
 
 
 @router.post("/investment-plan")
-def get_investment_plan(request: InvestmentPlanRequest):
+async def get_investment_plan(request: InvestmentPlanRequest, db: RequestDB = Depends(get_db)):
     """
     Get personalized investment plan for user.
     
@@ -190,52 +220,13 @@ def get_investment_plan(request: InvestmentPlanRequest):
     Returns:
         Investment plan with portfolio allocation and fund recommendations
     """
-    # Fetch user
-    user = get_user(request.user_id)
-    if not user:
-        raise HTTPException(
-            status_code=404,
-            detail=f"User with id {request.user_id} not found"
-        )
-    
-    # Fetch user transactions
-    transactions_data = get_transactions(user_id=request.user_id)
-    
-    if not transactions_data:
-        raise HTTPException(
-            status_code=404,
-            detail="No transactions found for this user"
-        )
-    
-    # Convert to Transaction objects for auditor
-    transactions = [Transaction(**t) for t in transactions_data]
+    # Fetch user and transactions concurrently
+    user, transactions_data = await _fetch_user_and_transactions(db, request.user_id)
     
-    # Run auditor
-    try:
-        report = audit_finances(transactions)
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to generate financial report: {str(e)}"
-        )
-    
-    # Run strategist
-    try:
-        plan = create_safety_plan(report, user["risk_profile"])
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to create safety plan: {str(e)}"
-        )
-    
-    # Run catalyst
-    try:
-        proposal = propose_portfolio(plan, user["risk_profile"])
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to propose portfolio: {str(e)}"
-        )
+    # Run auditor → strategist → catalyst off the event loop
+    report, plan, proposal = await asyncio.to_thread(
+        _run_agents, transactions_data, user["risk_profile"]
+    )
     
     # Get fund suggestions based on risk profile and investable amount
     from app.services.fund_suggestions import get_funds_by_risk_profile, format_fund_suggestions
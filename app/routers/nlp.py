@@ -1,20 +1,148 @@
 """Unified chat/message router - single entry point for all user messages."""
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from pydantic import BaseModel
 from datetime import datetime, date
-from typing import Optional
-from app.db.db import get_user, create_transaction, get_transactions
+from typing import Dict, Any, List, Literal, Optional
+from app.db.request_cache import RequestDB, get_db
 from app.services.whisper_service import whisper_service
-from app.services.extraction_service import extract_transaction
-from app.services.autonomous_coach import analyze_and_coach
+from app.services.extraction_service import extract_transaction_async
+from app.services.autonomous_coach import (
+    analyze_and_coach_async,
+    transaction_history,
+    TransactionHistory,
+    RECENT_TRANSACTIONS_LIMIT
+)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
+class ChatBatchRequest(BaseModel):
+    """Request model for the batch message endpoint."""
+    user_id: int
+    texts: List[str]
+    # all_at_once sends every LLM call concurrently; single_sample sends them one by one
+    mode: Literal["all_at_once", "single_sample"] = "all_at_once"
+
+
+def _build_transactions(user_id: int, transaction_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Build the income/expense rows to store for an extracted transaction.
+    
+    Args:
+        user_id: User ID
+        transaction_data: Output of extract_transaction_async
+        
+    Returns:
+        Transaction dicts ready for create_transactions (possibly empty)
+    """
+    # Parse date
+    transaction_date = date.today()
+    if transaction_data.get("date"):
+        try:
+            transaction_date = datetime.strptime(
+                transaction_data["date"],
+                "%Y-%m-%d"
+            ).date()
+        except ValueError:
+            # If date parsing fails, use today
+            transaction_date = date.today()
+    
+    # Collect income/expense rows so the caller can save them in one write
+    pending_transactions = []
+    
+    # Save income transaction if present
+    if transaction_data.get("income", 0) > 0:
+        income_transaction = {
+            "user_id": user_id,
+            "amount": transaction_data["income"],
+            "type": "income",
+            "tag": "income",
+            "category": None,
+            "date": transaction_date
+        }
+        pending_transactions.append(income_transaction)
+    
+    # Save expense transaction if present
+    if transaction_data.get("expense", 0) > 0:
+        tags = transaction_data.get("tags", [])
+        tag_str = ", ".join(tags) if tags else "expense"
+        
+        expense_transaction = {
+            "user_id": user_id,
+            "amount": transaction_data["expense"],
+            "type": "expense",
+            "tag": tag_str,
+            "category": transaction_data.get("expenseType"),
+            "date": transaction_date
+        }
+        pending_transactions.append(expense_transaction)
+    
+    return pending_transactions
+
+
+async def _coach(
+    user_id: int,
+    transaction_data: Dict[str, Any],
+    user: Dict[str, Any],
+    history: TransactionHistory,
+    input_text: str
+) -> Dict[str, Any]:
+    """
+    Run the autonomous coach and build the chat response for one message.
+    
+    Args:
+        user_id: User ID
+        transaction_data: Output of extract_transaction_async
+        user: User information dict
+        history: The user's recent transactions from transaction_history
+        input_text: Original message, used for language detection
+        
+    Returns:
+        Response dict with "message" (None unless the coach intervenes) and
+        "fund_suggestions" when provided
+    """
+    # Call autonomous coaching agent (works silently in background)
+    coaching_response = None
+    try:
+        coaching_response = await analyze_and_coach_async(
+            user_id=user_id,
+            transaction_data=transaction_data,
+            user=user,
+            all_transactions=history,
+            input_text=input_text  # Pass input text for language detection
+        )
+    except Exception as e:
+        # If coaching fails, silently continue (non-blocking)
+        coaching_response = {
+            "should_intervene": False,
+            "regret_message": None,
+            "fund_suggestions": []
+        }
+    
+    response = {}
+    
+    # ONLY add message if agent decided intervention is needed
+    # This ensures we work silently and only speak when necessary
+    if coaching_response and coaching_response.get("should_intervene", False):
+        response["message"] = coaching_response.get("regret_message")  # Single message in user's language
+        
+        # Only include fund suggestions if provided and meaningful
+        if coaching_response.get("fund_suggestions"):
+            response["fund_suggestions"] = coaching_response.get("fund_suggestions")
+    else:
+        # No intervention needed - return null message or omit it
+        response["message"] = None
+    
+    return response
+
+
 @router.post("/message")
 async def handle_message(
     user_id: int = Form(...),
     text: Optional[str] = Form(None),
     audio: Optional[UploadFile] = File(None),
+    db: RequestDB = Depends(get_db),
 ):
     """
     Single unified endpoint for all user messages.
@@ -43,7 +171,7 @@ async def handle_message(
         )
     
     # Validate user exists
-    user = get_user(user_id)
+    user = db.user(user_id)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -55,7 +183,13 @@ async def handle_message(
     if audio:
         # Transcribe audio
         try:
-            input_text = whisper_service.transcribe_audio(audio)
+            input_text = await whisper_service.transcribe_audio(audio)
+        except ValueError as e:
+            # Unnamed, unsupported, oversized, empty or speechless upload
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to transcribe audio: {str(e)}"
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -72,89 +206,92 @@ async def handle_message(
     
     # Extract transaction data
     try:
-        transaction_data = extract_transaction(input_text)
+        transaction_data = await extract_transaction_async(input_text)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to extract transaction: {str(e)}"
         )
     
-    # Parse date
-    transaction_date = date.today()
-    if transaction_data.get("date"):
-        try:
-            transaction_date = datetime.strptime(
-                transaction_data["date"],
-                "%Y-%m-%d"
-            ).date()
-        except ValueError:
-            # If date parsing fails, use today
-            transaction_date = date.today()
+    pending_transactions = _build_transactions(user_id, transaction_data)
+    if pending_transactions:
+        db.create_transactions(pending_transactions)
     
-    # Save income transaction if present
-    if transaction_data.get("income", 0) > 0:
-        income_transaction = {
-            "user_id": user_id,
-            "amount": transaction_data["income"],
-            "type": "income",
-            "tag": "income",
-            "category": None,
-            "date": transaction_date
-        }
-        create_transaction(income_transaction)
-    
-    # Save expense transaction if present
-    if transaction_data.get("expense", 0) > 0:
-        tags = transaction_data.get("tags", [])
-        tag_str = ", ".join(tags) if tags else "expense"
-        
-        expense_transaction = {
-            "user_id": user_id,
-            "amount": transaction_data["expense"],
-            "type": "expense",
-            "tag": tag_str,
-            "category": transaction_data.get("expenseType"),
-            "date": transaction_date
-        }
-        create_transaction(expense_transaction)
-    
-    # Get all user transactions for autonomous coaching analysis
-    all_transactions = get_transactions(user_id=user_id)
-    
-    # Call autonomous coaching agent (works silently in background)
-    coaching_response = None
-    try:
-        coaching_response = analyze_and_coach(
-            user_id=user_id,
-            transaction_data=transaction_data,
-            user=user,
-            all_transactions=all_transactions,
-            input_text=input_text  # Pass input text for language detection
-        )
-    except Exception as e:
-        # If coaching fails, silently continue (non-blocking)
-        coaching_response = {
-            "should_intervene": False,
-            "regret_message": None,
-            "fund_suggestions": []
-        }
+    # Get the user's most recent transactions for autonomous coaching analysis
+    history = transaction_history(db.transactions(user_id=user_id, limit=RECENT_TRANSACTIONS_LIMIT))
     
     # Build response - simple and clean
     # Only return message if autonomous coach decided intervention is needed
     response = {
         "success": True
     }
+    response.update(await _coach(user_id, transaction_data, user, history, input_text))
     
-    # ONLY add message if agent decided intervention is needed
-    # This ensures we work silently and only speak when necessary
-    if coaching_response and coaching_response.get("should_intervene", False):
-        response["message"] = coaching_response.get("regret_message")  # Single message in user's language
-        
-        # Only include fund suggestions if provided and meaningful
-        if coaching_response.get("fund_suggestions"):
-            response["fund_suggestions"] = coaching_response.get("fund_suggestions")
+    return response
+
+
+@router.post("/messages")
+async def handle_messages(request: ChatBatchRequest, db: RequestDB = Depends(get_db)):
+    """
+    Batch endpoint for several text messages from one user (e.g. a day's expenses).
+    
+    Extracts every message, saves all resulting transactions in one write,
+    then coaches each message against the updated history. In "all_at_once"
+    mode the extraction and coaching LLM calls are submitted concurrently
+    (Ollama runs up to OLLAMA_NUM_PARALLEL of them at a time); in
+    "single_sample" mode they run one after another.
+    
+    Returns:
+    - { "success": true, "results": [ { "message": ..., "fund_suggestions": ... }, ... ] }
+      with one result per non-blank input text, in order
+    """
+    user_id = request.user_id
+    texts = [text for text in request.texts if text.strip()]
+    if not texts:
+        raise HTTPException(
+            status_code=400,
+            detail="No text content found in input"
+        )
+    
+    # Validate user exists
+    user = db.user(user_id)
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail=f"User with id {user_id} not found"
+        )
+    
+    # Extract transaction data
+    try:
+        if request.mode == "all_at_once":
+            extracted = await asyncio.gather(*[extract_transaction_async(text) for text in texts])
+        else:
+            extracted = [await extract_transaction_async(text) for text in texts]
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to extract transaction: {str(e)}"
+        )
+    
+    pending_transactions = []
+    for transaction_data in extracted:
+        pending_transactions.extend(_build_transactions(user_id, transaction_data))
+    if pending_transactions:
+        db.create_transactions(pending_transactions)
+    
+    # Parse the shared history once for every message
+    history = transaction_history(db.transactions(user_id=user_id, limit=RECENT_TRANSACTIONS_LIMIT))
+    
+    coach_jobs = [
+        _coach(user_id, transaction_data, user, history, text)
+        for transaction_data, text in zip(extracted, texts)
+    ]
+    if request.mode == "all_at_once":
+        results = await asyncio.gather(*coach_jobs)
     else:
-        # No intervention needed - return null message or omit it
-        response["message"] = None
+        results = [await job for job in coach_jobs]
     
-    return response
+    return {
+        "success": True,
+        "results": results
+    }
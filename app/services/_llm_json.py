@@ -0,0 +1,100 @@
+"""Helpers for pulling JSON out of raw LLM output."""
+import re
+from typing import AsyncIterable, List
+
+# A ```/```json fenced object
+_FENCED_JSON_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
+
+
+def extract_json_blob(text: str) -> str:
+    """
+    Extract the JSON object from model output that may be wrapped in
+    markdown code fences or surrounded by extra prose.
+    
+    Args:
+        text: Raw model output
+        
+    Returns:
+        The fenced object, else the first balanced {...} in the text, or the
+        stripped input if it contains no object
+    """
+    match = _FENCED_JSON_RE.search(text)
+    if match:
+        return match.group(1)
+    
+    start = text.find("{")
+    if start == -1:
+        return text.strip()
+    # Stop at the brace closing the first object, so a second object or
+    # prose with braces after it is left out
+    scanner = _ObjectScanner()
+    if scanner.feed(text[start:]):
+        return text[start:start + scanner.end]
+    # Unbalanced (e.g. truncated) output: hand over everything up to the last brace
+    end = text.rfind("}")
+    return text[start:end + 1] if end > start else text[start:].strip()
+
+
+class _ObjectScanner:
+    """Accumulates streamed model output and spots the end of the first JSON object."""
+
+    def __init__(self):
+        """Initialize an empty scanner."""
+        self.parts: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # Characters fed so far, and where the first object ended once it has
+        self._fed = 0
+        self.end = -1
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add a chunk of output.
+        
+        Args:
+            chunk: Next piece of model output
+            
+        Returns:
+            True once the first top-level {...} object is complete
+        """
+        self.parts.append(chunk)
+        offset = self._fed
+        self._fed += len(chunk)
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                # Braces inside string values do not count
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == "{":
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if not self._depth:
+                    self.end = offset + i + 1
+                    return True
+            elif char == '"' and self._depth:
+                self._in_string = True
+        return False
+
+
+async def aread_json_stream(chunks: AsyncIterable[str]) -> str:
+    """
+    Read streamed model output only until its first JSON object is complete,
+    so trailing chatter is never waited for.
+    
+    Args:
+        chunks: Pieces of model output; iteration stops early
+        
+    Returns:
+        The text received so far, for extract_json_blob
+    """
+    scanner = _ObjectScanner()
+    async for chunk in chunks:
+        if scanner.feed(chunk):
+            break
+    return "".join(scanner.parts)
@@ -1,15 +1,15 @@
 """Auditor agent for analyzing financial transactions."""
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
-from app.models.transaction import Transaction
+from datetime import date, datetime
 
 
-def audit_finances(transactions: List[Transaction]) -> Dict[str, Any]:
+def audit_finances(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Analyze user transactions and generate financial report.
     
     Args:
-        transactions: List of Transaction objects
+        transactions: List of transaction dicts as returned by storage
+            (only amount, type, tag and date are read)
         
     Returns:
         FinancialReport dictionary containing:
@@ -28,25 +28,27 @@ def audit_finances(transactions: List[Transaction]) -> Dict[str, Any]:
             "saving_potential": 0.0
         }
     
-    # Get current month's transactions
+    # Get current month's start
     now = datetime.now()
-    current_month_start = datetime(now.year, now.month, 1)
+    current_month_start = date(now.year, now.month, 1)
     
-    monthly_transactions = [
-        t for t in transactions
-        if datetime.combine(t.date, datetime.min.time()) >= current_month_start
-    ]
-    
-    # Calculate monthly income and expenses
-    monthly_income = sum(
-        t.amount for t in monthly_transactions
-        if t.type == "income"
-    )
-    
-    monthly_expenses = sum(
-        t.amount for t in monthly_transactions
-        if t.type == "expense"
-    )
+    # Calculate monthly income, expenses and per-tag expense totals in one pass
+    # Float accumulators keep the report's types independent of stored int amounts
+    monthly_income = 0.0
+    monthly_expenses = 0.0
+    tag_totals = {}
+    for t in transactions:
+        if t["date"] < current_month_start:
+            continue
+        t_type = t["type"]
+        if t_type == "income":
+            monthly_income += t["amount"]
+        elif t_type == "expense":
+            amount = t["amount"]
+            monthly_expenses += amount
+            tag = t.get("tag")
+            if tag:
+                tag_totals[tag] = tag_totals.get(tag, 0.0) + amount
     
     # Calculate burn rate (expenses / income)
     # If no income, burn rate is 100% (spending everything)
@@ -60,11 +62,6 @@ def audit_finances(transactions: List[Transaction]) -> Dict[str, Any]:
     # Identify leaks (expense tags where spending > 15% of total expenses)
     leaks = []
     if monthly_expenses > 0:
-        tag_totals = {}
-        for t in monthly_transactions:
-            if t.type == "expense" and t.tag:
-                tag_totals[t.tag] = tag_totals.get(t.tag, 0) + t.amount
-        
         leak_threshold = monthly_expenses * 0.15
         leaks = [
             tag for tag, total in tag_totals.items()
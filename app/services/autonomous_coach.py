@@ -1,10 +1,14 @@
 """Autonomous coaching agent that analyzes transactions and provides personalized advice."""
-import json
-import requests
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+import re
+import orjson
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple, Union
+from datetime import date, datetime, timedelta
 from app.config import settings
 from app.services.fund_suggestions import get_funds_by_risk_profile, format_fund_suggestions
+from app.services import ollama_client
+from app.services._llm_json import aread_json_stream, extract_json_blob
+from app.services.llm_cache import LLMCache
+from app.services.llm_fallback import hedged_call
 
 # Try to import Gemini, but make it optional
 try:
@@ -13,201 +17,82 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
-
-def _call_gemini_for_coaching(prompt: str) -> Optional[Dict[str, Any]]:
-    """Call Gemini API for autonomous coaching analysis."""
-    if not GEMINI_AVAILABLE or not settings.gemini_api_key:
-        return None
-    
+# Configure Gemini and build the model once for the process instead of on every call
+_gemini_model = None
+if GEMINI_AVAILABLE and settings.gemini_api_key:
     try:
         genai.configure(api_key=settings.gemini_api_key)
-        model = genai.GenerativeModel(settings.gemini_model)
-        
-        response = model.generate_content(
-            prompt,
+        _gemini_model = genai.GenerativeModel(
+            settings.gemini_model,
             generation_config=genai.types.GenerationConfig(
                 temperature=0.7,
-                response_mime_type="application/json"
+                response_mime_type="application/json",
+                max_output_tokens=settings.coaching_max_output_tokens,
+                candidate_count=1
             )
         )
-        
-        result_text = response.text.strip()
-        # Clean JSON if needed
-        if result_text.startswith("```json"):
-            lines = result_text.split("\n")
-            result_text = "\n".join([line for line in lines if not line.strip().startswith("```")])
-        elif result_text.startswith("```"):
-            lines = result_text.split("\n")
-            result_text = "\n".join([line for line in lines if not line.strip().startswith("```")])
-        
-        if "{" in result_text and "}" in result_text:
-            start_idx = result_text.find("{")
-            end_idx = result_text.rfind("}") + 1
-            result_text = result_text[start_idx:end_idx]
-        
-        return json.loads(result_text)
     except Exception:
-        return None
+        # Leave Gemini disabled; calls fall back to Ollama
+        _gemini_model = None
 
+# Coaching decisions for previously seen spending situations
+_cache = LLMCache("coaching")
 
-def _call_ollama_for_coaching(prompt: str) -> Dict[str, Any]:
-    """Call Ollama API for autonomous coaching analysis."""
-    url = f"{settings.ollama_url}/api/generate"
-    payload = {
-        "model": settings.ollama_model,
-        "prompt": prompt,
-        "stream": False,
-        "format": "json"
-    }
-    
-    response = requests.post(url, json=payload, timeout=60)
-    response.raise_for_status()
-    
-    result = response.json()
-    response_text = result.get("response", "").strip()
-    
-    # Parse JSON response
-    if response_text.startswith("```json"):
-        lines = response_text.split("\n")
-        response_text = "\n".join([line for line in lines if not line.strip().startswith("```")])
-    elif response_text.startswith("```"):
-        lines = response_text.split("\n")
-        response_text = "\n".join([line for line in lines if not line.strip().startswith("```")])
-    
-    if "{" in response_text and "}" in response_text:
-        start_idx = response_text.find("{")
-        end_idx = response_text.rfind("}") + 1
-        response_text = response_text[start_idx:end_idx]
-    
-    return json.loads(response_text)
+# Number of most recent transactions the coach looks at
+RECENT_TRANSACTIONS_LIMIT = 20
 
+# Expenses below this never trigger an intervention
+SMALL_EXPENSE_LIMIT = 100
 
-def _detect_language(text: str) -> str:
-    """Detect if text is in Hinglish/Hindi or English."""
-    # Simple detection: check for Devanagari script or common Hindi words
-    hindi_words = ['maine', 'kamaye', 'kharch', 'diye', 'liye', 'kar', 'tune', 'tera', 'tu']
-    text_lower = text.lower()
-    if any(word in text_lower for word in hindi_words):
-        return "hinglish"
-    # Check for Devanagari characters
-    if any('\u0900' <= char <= '\u097F' for char in text):
-        return "hindi"
-    return "english"
+# A first expense on a category this week below this never triggers one
+FIRST_EXPENSE_LIMIT = 500
 
+# Expense tags that are always necessary spending
+_NECESSARY_TAGS = frozenset({
+    "groceries", "grocery", "rent", "bills", "bill", "utilities", "medicine", "transport"
+})
 
-def analyze_and_coach(
-    user_id: int,
-    transaction_data: Dict[str, Any],
-    user: Dict[str, Any],
-    all_transactions: List[Dict[str, Any]],
-    input_text: str = ""
-) -> Dict[str, Any]:
-    """
-    Autonomous coaching agent that analyzes transactions and decides on intervention.
-    Works silently - only returns message when intervention is needed.
-    
-    Args:
-        user_id: User ID
-        transaction_data: Latest transaction data
-        user: User information dict
-        all_transactions: All user transactions
-        input_text: Original input text to detect language
-        
-    Returns:
-        Coaching response with regret message and fund suggestions (only if intervention needed)
-    """
-    # Detect input language
-    detected_language = _detect_language(input_text) if input_text else "hinglish"
-    
-    # Prepare context for AI analysis
-    recent_transactions = all_transactions[:20]  # Last 20 transactions
-    
-    # Calculate spending patterns
-    expense_tags = {}
-    total_expenses = 0
-    for t in recent_transactions:
-        if t.get("type") == "expense":
-            tag = t.get("tag", "unknown")
-            amount = t.get("amount", 0)
-            expense_tags[tag] = expense_tags.get(tag, 0) + amount
-            total_expenses += amount
-    
-    # Get current transaction details
-    current_expense = transaction_data.get("expense", 0)
-    current_income = transaction_data.get("income", 0)
-    current_tags = transaction_data.get("tags", [])
-    current_tag = ", ".join(current_tags) if current_tags else "expense"
-    transaction_date_str = str(transaction_data.get('date', 'today'))
-    
-    # Calculate spending on current tag in recent period (last 7 days)
-    week_ago = datetime.now() - timedelta(days=7)
-    recent_tag_spending = 0
-    recent_tag_count = 0
-    
-    for t in recent_transactions:
-        t_date = t.get("date")
-        t_datetime = None
-        
-        if isinstance(t_date, str):
-            try:
-                t_datetime = datetime.strptime(t_date, "%Y-%m-%d")
-            except:
-                try:
-                    # Try parsing as date object string
-                    from datetime import date as date_class
-                    t_date_obj = date_class.fromisoformat(t_date)
-                    t_datetime = datetime.combine(t_date_obj, datetime.min.time())
-                except:
-                    continue
-        elif hasattr(t_date, 'isoformat'):
-            # It's a date object
-            try:
-                t_datetime = datetime.combine(t_date, datetime.min.time())
-            except:
-                continue
-        else:
-            continue
-            
-        if t_datetime and t.get("type") == "expense" and t.get("tag") == current_tag:
-            if t_datetime >= week_ago:
-                recent_tag_spending += t.get("amount", 0)
-                recent_tag_count += 1
-    
-    # Build comprehensive prompt
-    language_instruction = ""
-    if detected_language in ["hinglish", "hindi"]:
-        language_instruction = "IMPORTANT: The user is speaking in Hinglish/Hindi. You MUST respond ONLY in Hinglish/Hindi mix. Use words like 'bhai', 'yaar', 'tune', 'tu', 'tera', 'me', 'diye', 'kar deta', etc."
-    else:
-        language_instruction = "IMPORTANT: The user is speaking in English. Respond in English but you can use some Hinglish terms naturally if appropriate."
-    
-    prompt = f"""You are an autonomous financial coaching agent for Indian users. You work SILENTLY in the background. Only intervene when there's a clear need.
+# Common Hindi words; matched anywhere in the text so inflected forms such
+# as "kharcha" or "karke" still count
+_HINDI_WORDS = ('maine', 'kamaye', 'kharch', 'diye', 'liye', 'kar', 'tune', 'tera', 'tu')
+_HINDI_WORDS_RE = re.compile("|".join(_HINDI_WORDS))
+
+# Devanagari Unicode block
+_DEVANAGARI_RE = re.compile("[\u0900-\u097F]")
+
+# Language instructions for the coaching prompt
+_LANG_HINGLISH = "IMPORTANT: The user is speaking in Hinglish/Hindi. You MUST respond ONLY in Hinglish/Hindi mix. Use words like 'bhai', 'yaar', 'tune', 'tu', 'tera', 'me', 'diye', 'kar deta', etc."
+_LANG_ENGLISH = "IMPORTANT: The user is speaking in English. Respond in English but you can use some Hinglish terms naturally if appropriate."
 
-{language_instruction}
+# Coaching prompt template, filled in with str.format
+_COACH_PROMPT = """You are an autonomous financial coaching agent for Indian users. You work SILENTLY in the background. Only intervene when there's a clear need.
+
+{lang}
 
 Analyze the following transaction and user context, then decide if you should intervene with a regret/coaching message.
 
 USER CONTEXT:
-- Name: {user.get('name', 'User')}
-- Risk Profile: {user.get('risk_profile', 'medium')}
-- Goals: {user.get('goals', 'Not specified')}
+- Name: {name}
+- Risk Profile: {risk}
+- Goals: {goals}
 
 CURRENT TRANSACTION:
-- Income: ₹{current_income}
-- Expense: ₹{current_expense}
-- Expense Tag/Category: {current_tag}
-- Date: {transaction_date_str}
+- Income: ₹{income}
+- Expense: ₹{expense}
+- Expense Tag/Category: {tag}
+- Date: {date}
 
 SPENDING PATTERNS (Last 20 transactions):
-{json.dumps(expense_tags, indent=2)}
-Total Expenses (recent): ₹{total_expenses}
+{patterns_json}
+Total Expenses (recent): ₹{total}
 
 RECENT SPENDING ON CURRENT TAG (Last 7 days):
-- Amount spent on "{current_tag}": ₹{recent_tag_spending}
-- Number of transactions: {recent_tag_count}
-- Current transaction adds: ₹{current_expense}
+- Amount spent on "{tag}": ₹{recent_spend}
+- Number of transactions: {recent_count}
+- Current transaction adds: ₹{expense}
 
 RECENT TRANSACTIONS (Last 5):
-{json.dumps(recent_transactions[:5], indent=2, default=str)}
+{recent5_json}
 
 YOUR TASK:
 1. Analyze if this transaction shows a problematic spending pattern:
@@ -254,20 +139,309 @@ Return ONLY a valid JSON object (no markdown, no code blocks):
     "spending_insight": "key insight about the spending pattern (e.g., 'Spent ₹600 on cigarettes this week')"
 }}"""
 
-    # Try Gemini first, fallback to Ollama
-    coaching_result = _call_gemini_for_coaching(prompt)
+
+def _ollama_payload(prompt: str) -> Dict[str, Any]:
+    """Build the Ollama /api/generate payload for a coaching prompt."""
+    return {
+        "model": settings.ollama_model,
+        "prompt": prompt,
+        "stream": True,
+        "format": "json",
+        "options": {
+            "temperature": 0.7,
+            "num_predict": settings.coaching_max_output_tokens
+        }
+    }
+
+
+async def _call_gemini_for_coaching_async(prompt: str) -> Optional[Dict[str, Any]]:
+    """Call Gemini API for autonomous coaching analysis without blocking the event loop."""
+    if _gemini_model is None:
+        return None
     
-    if coaching_result is None:
+    try:
+        response = await _gemini_model.generate_content_async(prompt, stream=True)
+        return orjson.loads(extract_json_blob(await aread_json_stream(chunk.text async for chunk in response)))
+    except Exception:
+        return None
+
+
+async def _call_ollama_for_coaching_async(prompt: str) -> Dict[str, Any]:
+    """Call Ollama API for autonomous coaching analysis without blocking the event loop."""
+    result = await ollama_client.generate_json(_ollama_payload(prompt))
+    return orjson.loads(extract_json_blob(result.get("response", "")))
+
+
+def _detect_language(text: str) -> str:
+    """Detect if text is in Hinglish/Hindi or English."""
+    # Simple detection: check for Devanagari script or common Hindi words
+    if _HINDI_WORDS_RE.search(text.lower()):
+        return "hinglish"
+    # Check for Devanagari characters
+    if _DEVANAGARI_RE.search(text):
+        return "hindi"
+    return "english"
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    """
+    Normalize a stored transaction date to midnight of that day.
+    
+    Args:
+        value: date/datetime object or "YYYY-MM-DD" string
+        
+    Returns:
+        datetime, or None if the value is not a recognizable date
+    """
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            pass
         try:
-            coaching_result = _call_ollama_for_coaching(prompt)
-        except Exception as e:
-            # If both fail, return default response
-            return {
-                "should_intervene": False,
-                "regret_message": None,
-                "fund_suggestions": [],
-                "reasoning": f"Coaching analysis unavailable: {str(e)}"
-            }
+            return datetime.combine(date.fromisoformat(value), datetime.min.time())
+        except ValueError:
+            return None
+    return None
+
+
+class TransactionHistory(NamedTuple):
+    """
+    A user's recent transactions with the expense rows split into parallel
+    columns and their dates parsed once. Callers coaching several messages
+    against the same history build it once with transaction_history.
+    """
+    # Compact JSON of the newest rows, shown to the model as examples
+    latest_json: str
+    expense_tags: Tuple[str, ...]
+    expense_amounts: Tuple[Any, ...]
+    expense_dates: Tuple[Optional[datetime], ...]
+
+
+def _prompt_row(transaction: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a stored transaction to the fields the coaching prompt shows."""
+    t_date = transaction.get("date")
+    return {
+        "amount": transaction.get("amount"),
+        "type": transaction.get("type"),
+        "tag": transaction.get("tag"),
+        "category": transaction.get("category"),
+        "date": t_date.isoformat() if isinstance(t_date, date) else t_date
+    }
+
+
+def transaction_history(transactions: List[Dict[str, Any]]) -> TransactionHistory:
+    """
+    Build the coaching view of a user's transactions.
+    
+    Args:
+        transactions: User transactions, newest first (only the first
+            RECENT_TRANSACTIONS_LIMIT are used)
+        
+    Returns:
+        TransactionHistory for analyze_and_coach_async
+    """
+    recent_transactions = transactions[:RECENT_TRANSACTIONS_LIMIT]
+    expenses = [t for t in recent_transactions if t.get("type") == "expense"]
+    return TransactionHistory(
+        latest_json=orjson.dumps([_prompt_row(t) for t in recent_transactions[:5]]).decode(),
+        expense_tags=tuple(t.get("tag", "unknown") for t in expenses),
+        expense_amounts=tuple(t.get("amount", 0) for t in expenses),
+        expense_dates=tuple(_to_datetime(t.get("date")) for t in expenses)
+    )
+
+
+def _precheck(
+    current_income: float,
+    current_expense: float,
+    current_tags: List[str],
+    expense_type: Optional[str],
+    recent_tag_count: int
+) -> Optional[str]:
+    """
+    Apply the prompt's "don't intervene" rules without calling the LLM.
+    
+    Args:
+        current_income: Income in the current transaction
+        current_expense: Expense in the current transaction
+        current_tags: Expense tags of the current transaction
+        expense_type: "needs" | "wants" | None from extraction
+        recent_tag_count: Expenses on the current tag in the last 7 days,
+            including the current one
+        
+    Returns:
+        Why no intervention is needed, or None if the LLM should decide
+    """
+    if current_expense <= 0:
+        return "Income-only transaction" if current_income > 0 else "No expense in this transaction"
+    if current_expense < SMALL_EXPENSE_LIMIT:
+        return f"Small one-time expense (under ₹{SMALL_EXPENSE_LIMIT})"
+    if recent_tag_count <= 1 and current_expense < FIRST_EXPENSE_LIMIT:
+        return "First expense on this category this week"
+    if expense_type == "needs" or (current_tags and all(tag.lower() in _NECESSARY_TAGS for tag in current_tags)):
+        return "Necessary expense"
+    return None
+
+
+def _build_coaching_context(
+    user_id: int,
+    transaction_data: Dict[str, Any],
+    user: Dict[str, Any],
+    all_transactions: Union[List[Dict[str, Any]], TransactionHistory],
+    input_text: str
+) -> Dict[str, Any]:
+    """
+    Compute spending patterns and build the coaching prompt.
+    
+    Args:
+        user_id: User ID
+        transaction_data: Latest transaction data
+        user: User information dict
+        all_transactions: User transactions, newest first, including the
+            transaction being analyzed, or their TransactionHistory
+        input_text: Original input text to detect language
+        
+    Returns:
+        Dict with the prompt, its cache key and guard, and the figures needed
+        to pick fund suggestions; or just {"skip_reason": ...} when the
+        transaction cannot need an intervention
+    """
+    # Prepare context for AI analysis
+    history = (
+        all_transactions
+        if isinstance(all_transactions, TransactionHistory)
+        else transaction_history(all_transactions)
+    )
+    
+    # Get current transaction details
+    current_expense = transaction_data.get("expense", 0)
+    current_income = transaction_data.get("income", 0)
+    current_tags = transaction_data.get("tags", [])
+    current_tag = ", ".join(current_tags) if current_tags else "expense"
+    transaction_date_str = str(transaction_data.get('date', 'today'))
+    
+    # Calculate spending on current tag in recent period (last 7 days)
+    week_ago = datetime.now() - timedelta(days=7)
+    recent_tag_amounts = [
+        amount
+        for tag, amount, t_datetime in zip(history.expense_tags, history.expense_amounts, history.expense_dates)
+        if tag == current_tag and t_datetime is not None and t_datetime >= week_ago
+    ]
+    recent_tag_spending = sum(recent_tag_amounts)
+    recent_tag_count = len(recent_tag_amounts)
+    
+    # Most transactions cannot warrant an intervention; settle those here
+    # without building a prompt or calling the LLM
+    skip_reason = _precheck(
+        current_income,
+        current_expense,
+        current_tags,
+        transaction_data.get("expenseType"),
+        recent_tag_count
+    )
+    if skip_reason:
+        return {"skip_reason": skip_reason}
+    
+    # Detect input language
+    detected_language = _detect_language(input_text) if input_text else "hinglish"
+    
+    # Calculate spending patterns
+    expense_tags = {}
+    tag_total = expense_tags.get
+    total_expenses = 0
+    for tag, amount in zip(history.expense_tags, history.expense_amounts):
+        expense_tags[tag] = tag_total(tag, 0) + amount
+        total_expenses += amount
+    
+    # Build comprehensive prompt
+    prompt = _COACH_PROMPT.format(
+        lang=_LANG_HINGLISH if detected_language in ["hinglish", "hindi"] else _LANG_ENGLISH,
+        name=user.get('name', 'User'),
+        risk=user.get('risk_profile', 'medium'),
+        goals=user.get('goals', 'Not specified'),
+        income=current_income,
+        expense=current_expense,
+        tag=current_tag,
+        date=transaction_date_str,
+        patterns_json=orjson.dumps(expense_tags, option=orjson.OPT_NON_STR_KEYS).decode(),
+        total=total_expenses,
+        recent_spend=recent_tag_spending,
+        recent_count=recent_tag_count,
+        recent5_json=history.latest_json
+    )
+
+    # Similar tags may share a decision only when everything else the model
+    # sees matches. The regret message quotes the user's name and amounts,
+    # so decisions are never shared across users and amounts must match
+    # exactly.
+    cache_guard = "|".join(str(part) for part in (
+        user_id,
+        current_income,
+        current_expense,
+        recent_tag_spending,
+        recent_tag_count,
+        total_expenses,
+        detected_language,
+        user.get('risk_profile', 'medium'),
+        user.get('goals', 'Not specified'),
+    ))
+    
+    return {
+        "prompt": prompt,
+        "cache_key": current_tag.lower().strip(),
+        "cache_guard": cache_guard,
+        "current_income": current_income,
+        "current_expense": current_expense,
+        "current_tag": current_tag,
+        "expense_tags": expense_tags,
+        "recent_tag_spending": recent_tag_spending,
+    }
+
+
+def _coaching_unavailable(e: Exception) -> Dict[str, Any]:
+    """Default response when neither Gemini nor Ollama could be reached."""
+    return {
+        "should_intervene": False,
+        "regret_message": None,
+        "fund_suggestions": [],
+        "reasoning": f"Coaching analysis unavailable: {str(e)}"
+    }
+
+
+def _no_intervention(reason: str) -> Dict[str, Any]:
+    """Response for a transaction the pre-check settled without the LLM."""
+    return {
+        "should_intervene": False,
+        "regret_message": None,
+        "fund_suggestions": [],
+        "reasoning": reason,
+        "spending_insight": ""
+    }
+
+
+def _build_coaching_response(
+    coaching_result: Dict[str, Any],
+    context: Dict[str, Any],
+    user: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Turn the model's decision into the coaching response, adding fund suggestions.
+    
+    Args:
+        coaching_result: Parsed JSON returned by the model
+        context: Output of _build_coaching_context
+        user: User information dict
+        
+    Returns:
+        Coaching response with regret message and fund suggestions
+    """
+    current_income = context["current_income"]
+    current_expense = context["current_expense"]
+    current_tag = context["current_tag"]
+    expense_tags = context["expense_tags"]
+    recent_tag_spending = context["recent_tag_spending"]
     
     # Get fund suggestions ONLY if intervention is needed AND there's meaningful savings potential
     fund_suggestions = []
@@ -294,3 +468,49 @@ Return ONLY a valid JSON object (no markdown, no code blocks):
         "spending_insight": coaching_result.get("spending_insight", "")
     }
 
+
+async def analyze_and_coach_async(
+    user_id: int,
+    transaction_data: Dict[str, Any],
+    user: Dict[str, Any],
+    all_transactions: Union[List[Dict[str, Any]], TransactionHistory],
+    input_text: str = ""
+) -> Dict[str, Any]:
+    """
+    Autonomous coaching agent that analyzes transactions and decides on intervention.
+    Works silently - only returns message when intervention is needed. The
+    Gemini/Ollama calls do not block the event loop.
+    
+    Args:
+        user_id: User ID
+        transaction_data: Latest transaction data
+        user: User information dict
+        all_transactions: User transactions, newest first, including the
+            one being analyzed (only the first RECENT_TRANSACTIONS_LIMIT are
+            used), or a TransactionHistory built from them
+        input_text: Original input text to detect language
+        
+    Returns:
+        Coaching response with regret message and fund suggestions (only if intervention needed)
+    """
+    context = _build_coaching_context(user_id, transaction_data, user, all_transactions, input_text)
+    if "skip_reason" in context:
+        return _no_intervention(context["skip_reason"])
+    
+    coaching_result = await _cache.aget(context["cache_key"], context["cache_guard"])
+    if coaching_result is not None:
+        return _build_coaching_response(coaching_result, context, user)
+    
+    # Prefer Gemini; Ollama joins in if Gemini fails or is slow to answer
+    try:
+        coaching_result = await hedged_call(
+            lambda: _call_gemini_for_coaching_async(context["prompt"]),
+            lambda: _call_ollama_for_coaching_async(context["prompt"])
+        )
+    except Exception as e:
+        # If both fail, return default response
+        return _coaching_unavailable(e)
+    
+    await _cache.aput(context["cache_key"], coaching_result, context["cache_guard"])
+    
+    return _build_coaching_response(coaching_result, context, user)
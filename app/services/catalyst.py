@@ -1,5 +1,53 @@
 """Catalyst agent for proposing investment portfolios."""
-from typing import Dict, Any, List
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Tuple
+
+# Portfolio allocation (%) and scenario notes per risk profile. Shared and
+# read-only: callers get these objects as-is and must copy before mutating.
+_PROPOSALS_BY_RISK: Dict[str, Tuple[Mapping[str, int], Tuple[str, ...]]] = {
+    # Conservative: more debt and cash, less equity
+    "low": (
+        MappingProxyType({
+            "equity": 30,
+            "debt": 50,
+            "gold": 10,
+            "cash": 10
+        }),
+        (
+            "Conservative portfolio suitable for low-risk tolerance",
+            "Focus on capital preservation with steady returns",
+            "Higher allocation to debt instruments for stability"
+        )
+    ),
+    # Balanced
+    "medium": (
+        MappingProxyType({
+            "equity": 55,
+            "debt": 30,
+            "gold": 10,
+            "cash": 5
+        }),
+        (
+            "Balanced portfolio for moderate risk tolerance",
+            "Diversified allocation across asset classes",
+            "Good balance between growth and stability"
+        )
+    ),
+    # Aggressive: more equity, less debt
+    "high": (
+        MappingProxyType({
+            "equity": 70,
+            "debt": 15,
+            "gold": 10,
+            "cash": 5
+        }),
+        (
+            "Aggressive portfolio for high-risk tolerance",
+            "Higher equity exposure for long-term growth",
+            "Lower cash allocation to maximize returns"
+        )
+    ),
+}
 
 
 def propose_portfolio(
@@ -16,8 +64,8 @@ def propose_portfolio(
     Returns:
         InvestmentPortfolioProposal dictionary containing:
         - investable_amount (saving_potential - emergency_fund_target_contribution)
-        - portfolio { equity, debt, gold, cash }
-        - scenario_notes (list of strings)
+        - portfolio { equity, debt, gold, cash } (read-only mapping)
+        - scenario_notes (tuple of strings)
     """
     monthly_savings_target = plan.get("monthly_savings_target", 0)
     emergency_fund_goal = plan.get("emergency_fund_goal", 0)
@@ -32,46 +80,8 @@ def propose_portfolio(
     # Calculate investable amount (remaining after emergency fund contribution)
     investable_amount = max(0, monthly_savings_target - emergency_fund_monthly_contribution)
     
-    # Create portfolio allocation based on risk profile
-    if risk_profile == "low":
-        # Conservative: more debt and cash, less equity
-        portfolio = {
-            "equity": 30,
-            "debt": 50,
-            "gold": 10,
-            "cash": 10
-        }
-        scenario_notes = [
-            "Conservative portfolio suitable for low-risk tolerance",
-            "Focus on capital preservation with steady returns",
-            "Higher allocation to debt instruments for stability"
-        ]
-    elif risk_profile == "high":
-        # Aggressive: more equity, less debt
-        portfolio = {
-            "equity": 70,
-            "debt": 15,
-            "gold": 10,
-            "cash": 5
-        }
-        scenario_notes = [
-            "Aggressive portfolio for high-risk tolerance",
-            "Higher equity exposure for long-term growth",
-            "Lower cash allocation to maximize returns"
-        ]
-    else:  # medium
-        # Balanced
-        portfolio = {
-            "equity": 55,
-            "debt": 30,
-            "gold": 10,
-            "cash": 5
-        }
-        scenario_notes = [
-            "Balanced portfolio for moderate risk tolerance",
-            "Diversified allocation across asset classes",
-            "Good balance between growth and stability"
-        ]
+    # Pick portfolio allocation based on risk profile
+    portfolio, scenario_notes = _PROPOSALS_BY_RISK.get(risk_profile, _PROPOSALS_BY_RISK["medium"])
     
     return {
         "investable_amount": round(investable_amount, 2),
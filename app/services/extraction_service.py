@@ -1,9 +1,14 @@
 """Service for extracting structured transaction data from text using Gemini (primary) or Ollama (fallback)."""
-import json
-import requests
+import re
+import orjson
+import httpx
 from datetime import date
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from app.config import settings
+from app.services import ollama_client
+from app.services._llm_json import aread_json_stream, extract_json_blob
+from app.services.llm_cache import LLMCache
+from app.services.llm_fallback import hedged_call
 
 # Try to import Gemini, but make it optional
 try:
@@ -12,30 +17,32 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
-
-def _extract_with_gemini(text: str) -> Optional[Dict[str, Any]]:
-    """
-    Extract transaction using Gemini API.
-    
-    Args:
-        text: Input text
-        
-    Returns:
-        Transaction data dict or None if failed
-    """
-    if not GEMINI_AVAILABLE:
-        return None
-    
-    if not settings.gemini_api_key:
-        return None
-    
+# Configure Gemini and build the model once for the process instead of on every call
+_gemini_model = None
+if GEMINI_AVAILABLE and settings.gemini_api_key:
     try:
-        # Configure Gemini
         genai.configure(api_key=settings.gemini_api_key)
-        model = genai.GenerativeModel(settings.gemini_model)
-        
-        # Create prompt
-        prompt = f"""Extract financial transaction information from the following text and return ONLY a valid JSON object with no additional text.
+        _gemini_model = genai.GenerativeModel(
+            settings.gemini_model,
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.1,
+                response_mime_type="application/json",
+                max_output_tokens=settings.extraction_max_output_tokens,
+                candidate_count=1
+            )
+        )
+    except Exception:
+        # Leave Gemini disabled; calls fall back to Ollama
+        _gemini_model = None
+
+# Extraction results for previously seen texts
+_cache = LLMCache("extraction")
+
+# Amounts in the input; a cached result is only reused when these match
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Extraction prompt template, filled in with str.format
+_EXTRACT_PROMPT = """Extract financial transaction information from the following text and return ONLY a valid JSON object with no additional text.
 
 Text: {text}
 
@@ -54,107 +61,158 @@ Response: {{"income": 5000, "expense": 2000, "tags": ["groceries"], "expenseType
 
 Now extract from the given text:"""
 
-        # Call Gemini API
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1,
-                response_mime_type="application/json"
-            )
-        )
-        
-        response_text = response.text.strip()
-        
-        # Parse JSON response
-        transaction_data = json.loads(response_text)
+
+def _cache_key(text: str) -> Tuple[str, str]:
+    """
+    Build the (key, guard) pair used to look up cached extraction results.
+    
+    Args:
+        text: Input text
         
-        return transaction_data
+    Returns:
+        Normalized text, and the numbers in it that a similar text must share
+    """
+    key = " ".join(text.lower().split())
+    # Without digits the amount may be spelled out, so only an exact match is safe
+    guard = " ".join(_NUMBER_RE.findall(key)) or key
+    return key, guard
+
+
+def _cache_entry(transaction_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Get the copy of an extraction result to cache.
+    
+    Only results dated today are cached, and without their date, so a cache
+    hit is dated the day it is served; relative dates ("yesterday") would go stale.
+    
+    Args:
+        transaction_data: Extraction result with defaults applied
         
-    except Exception as e:
-        # Return None to trigger fallback
+    Returns:
+        Result to cache, or None if it should not be cached
+    """
+    if transaction_data["date"] != date.today().isoformat():
         return None
+    return {k: v for k, v in transaction_data.items() if k != "date"}
 
 
-def _extract_with_ollama(text: str) -> Dict[str, Any]:
+def _build_prompt(text: str) -> str:
     """
-    Extract transaction using Ollama API.
+    Build the extraction prompt for the given text.
     
     Args:
         text: Input text
         
     Returns:
-        Transaction data dict
-        
-    Raises:
-        Exception: If extraction fails
+        Prompt string
     """
-    # Create prompt for Ollama
-    prompt = f"""Extract financial transaction information from the following text and return ONLY a valid JSON object with no additional text.
+    return _EXTRACT_PROMPT.format(text=text)
 
-Text: {text}
 
-Return a JSON object with the following structure:
-{{
-    "income": <number or 0 if no income mentioned>,
-    "expense": <number or 0 if no expense mentioned>,
-    "tags": [<list of expense tags/descriptions>],
-    "expenseType": "<needs|wants|null>",
-    "date": "<YYYY-MM-DD or today's date if not mentioned>"
-}}
-
-Example:
-Text: "I earned 5000 rupees today and spent 2000 on groceries"
-Response: {{"income": 5000, "expense": 2000, "tags": ["groceries"], "expenseType": "needs", "date": "2024-01-15"}}
-
-Now extract from the given text:"""
-
-    # Call Ollama API
-    url = f"{settings.ollama_url}/api/generate"
-    payload = {
+def _ollama_payload(text: str) -> Dict[str, Any]:
+    """Build the Ollama /api/generate payload for the given text."""
+    return {
         "model": settings.ollama_model,
-        "prompt": prompt,
-        "stream": False,
-        "format": "json"
+        "prompt": _build_prompt(text),
+        "stream": True,
+        "format": "json",
+        "options": {
+            "temperature": 0.1,
+            "num_predict": settings.extraction_max_output_tokens
+        }
     }
+
+
+def _parse_ollama_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse transaction data out of an Ollama /api/generate response body.
     
-    response = requests.post(url, json=payload, timeout=60)
-    response.raise_for_status()
-    
-    result = response.json()
+    Args:
+        result: Decoded Ollama response
+        
+    Returns:
+        Transaction data dict
+        
+    Raises:
+        Exception: If the response is empty
+        orjson.JSONDecodeError: If the response is not valid JSON
+    """
     response_text = result.get("response", "")
     
     if not response_text:
         raise Exception("Empty response from Ollama API")
     
-    # Parse JSON response
-    # Sometimes Ollama returns markdown code blocks, so we need to extract JSON
-    response_text = response_text.strip()
-    if response_text.startswith("```json"):
-        # Extract JSON from code block
-        lines = response_text.split("\n")
-        json_lines = [line for line in lines if not line.strip().startswith("```")]
-        response_text = "\n".join(json_lines)
-    elif response_text.startswith("```"):
-        # Extract JSON from code block (any language)
-        lines = response_text.split("\n")
-        json_lines = [line for line in lines if not line.strip().startswith("```")]
-        response_text = "\n".join(json_lines)
-    
-    # Try to find JSON object in response
-    if "{" in response_text and "}" in response_text:
-        start_idx = response_text.find("{")
-        end_idx = response_text.rfind("}") + 1
-        response_text = response_text[start_idx:end_idx]
-    
-    transaction_data = json.loads(response_text)
+    # Sometimes Ollama wraps the JSON in markdown code blocks or extra text
+    return orjson.loads(extract_json_blob(response_text))
+
+
+def _apply_defaults(transaction_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in missing fields and reset fields with the wrong type."""
+    # Validate and set defaults
+    transaction_data.setdefault("income", 0)
+    transaction_data.setdefault("expense", 0)
+    transaction_data.setdefault("tags", [])
+    transaction_data.setdefault("expenseType", None)
+    transaction_data.setdefault("date", None)
+    
+    # Validate types
+    if not isinstance(transaction_data["income"], (int, float)):
+        transaction_data["income"] = 0
+    if not isinstance(transaction_data["expense"], (int, float)):
+        transaction_data["expense"] = 0
+    if not isinstance(transaction_data["tags"], list):
+        transaction_data["tags"] = []
+    
+    # Set default date to today if not provided
+    if not transaction_data.get("date"):
+        transaction_data["date"] = date.today().isoformat()
     
     return transaction_data
 
 
-def extract_transaction(text: str) -> Dict[str, Any]:
+async def _extract_with_gemini_async(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract transaction using Gemini API without blocking the event loop.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Transaction data dict or None if failed
+    """
+    if _gemini_model is None:
+        return None
+    
+    try:
+        response = await _gemini_model.generate_content_async(_build_prompt(text), stream=True)
+        return orjson.loads(extract_json_blob(await aread_json_stream(chunk.text async for chunk in response)))
+    except Exception:
+        # Return None to trigger fallback
+        return None
+
+
+async def _extract_with_ollama_async(text: str) -> Dict[str, Any]:
+    """
+    Extract transaction using Ollama API without blocking the event loop.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Transaction data dict
+        
+    Raises:
+        Exception: If extraction fails
+    """
+    result = await ollama_client.generate_json(_ollama_payload(text))
+    return _parse_ollama_response(result)
+
+
+async def extract_transaction_async(text: str) -> Dict[str, Any]:
     """
     Extract structured transaction information from text.
-    Tries Gemini first, falls back to Ollama if Gemini is unavailable.
+    Tries Gemini first, falls back to Ollama if Gemini is unavailable, fails,
+    or has not answered within settings.llm_hedge_delay seconds.
     
     Args:
         text: Input text (transcribed or direct text)
@@ -172,44 +230,33 @@ def extract_transaction(text: str) -> Dict[str, Any]:
     Raises:
         Exception: If both Gemini and Ollama fail
     """
-    # Try Gemini first
-    transaction_data = _extract_with_gemini(text)
-    
-    # Fallback to Ollama if Gemini failed or is unavailable
-    if transaction_data is None:
-        try:
-            transaction_data = _extract_with_ollama(text)
-        except requests.exceptions.ConnectionError as e:
-            raise Exception(
-                f"Cannot connect to Ollama API at {settings.ollama_url}. "
-                "Make sure Ollama is running. Also ensure Gemini API key is set if you want to use Gemini."
-            )
-        except requests.exceptions.Timeout as e:
-            raise Exception("Ollama API request timed out after 60 seconds")
-        except requests.RequestException as e:
-            raise Exception(f"Failed to call Ollama API: {str(e)}")
-        except json.JSONDecodeError as e:
-            raise Exception(f"Failed to parse JSON response from Ollama: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Failed to extract transaction with Ollama: {str(e)}")
-    
-    # Validate and set defaults
-    transaction_data.setdefault("income", 0)
-    transaction_data.setdefault("expense", 0)
-    transaction_data.setdefault("tags", [])
-    transaction_data.setdefault("expenseType", None)
-    transaction_data.setdefault("date", None)
-    
-    # Validate types
-    if not isinstance(transaction_data["income"], (int, float)):
-        transaction_data["income"] = 0
-    if not isinstance(transaction_data["expense"], (int, float)):
-        transaction_data["expense"] = 0
-    if not isinstance(transaction_data["tags"], list):
-        transaction_data["tags"] = []
+    key, guard = _cache_key(text)
+    transaction_data = await _cache.aget(key, guard)
+    if transaction_data is not None:
+        return _apply_defaults(transaction_data)
     
-    # Set default date to today if not provided
-    if not transaction_data.get("date"):
-        transaction_data["date"] = date.today().isoformat()
+    # Prefer Gemini; Ollama joins in if Gemini fails or is slow to answer
+    try:
+        transaction_data = await hedged_call(
+            lambda: _extract_with_gemini_async(text),
+            lambda: _extract_with_ollama_async(text)
+        )
+    except httpx.ConnectError as e:
+        raise Exception(
+            f"Cannot connect to Ollama API at {settings.ollama_url}. "
+            "Make sure Ollama is running. Also ensure Gemini API key is set if you want to use Gemini."
+        )
+    except httpx.TimeoutException as e:
+        raise Exception("Ollama API request timed out after 60 seconds")
+    except httpx.HTTPError as e:
+        raise Exception(f"Failed to call Ollama API: {str(e)}")
+    except orjson.JSONDecodeError as e:
+        raise Exception(f"Failed to parse JSON response from Ollama: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Failed to extract transaction with Ollama: {str(e)}")
     
+    transaction_data = _apply_defaults(transaction_data)
+    entry = _cache_entry(transaction_data)
+    if entry is not None:
+        await _cache.aput(key, entry, guard)
     return transaction_data
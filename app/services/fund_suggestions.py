@@ -1,5 +1,8 @@
 """Fund suggestions database and selection logic."""
-from typing import List, Dict, Any
+from bisect import bisect_right
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, Tuple
 
 
 # Popular Indian Mutual Funds Database
@@ -106,8 +109,78 @@ FUNDS_DATABASE = [
     },
 ]
 
+# Fund entries already have the API response shape; freeze them so the
+# shared records can be returned to callers without copying
+FUNDS_DATABASE = [MappingProxyType(fund) for fund in FUNDS_DATABASE]
 
-def get_funds_by_risk_profile(risk_profile: str, investable_amount: float = 0) -> List[Dict[str, Any]]:
+
+# Maximum number of funds suggested at once
+MAX_SUGGESTIONS = 6
+
+# Funds grouped by type, in database order
+_BY_TYPE: Dict[str, List[Mapping[str, Any]]] = {}
+for _fund in FUNDS_DATABASE:
+    _BY_TYPE.setdefault(_fund["type"], []).append(_fund)
+
+# Per risk profile: (preferred funds in suggestion order, funds to draw one
+# diversifying pick from). Only the minimum-investment filter depends on the
+# call, so everything else is worked out here once.
+_PROFILE_FUNDS: Dict[str, Tuple[List[Mapping[str, Any]], List[Mapping[str, Any]]]] = {
+    # Prefer debt and hybrid funds, plus some equity for diversification
+    "low": (
+        [f for f in FUNDS_DATABASE if f["type"] in ["debt", "hybrid"] or f["risk_level"] == "low"],
+        _BY_TYPE.get("equity", []),
+    ),
+    # Prefer equity funds, plus some debt for stability
+    "high": (
+        [f for f in FUNDS_DATABASE if f["type"] == "equity" or f["risk_level"] == "high"],
+        _BY_TYPE.get("debt", []),
+    ),
+    # Balanced mix
+    "medium": (FUNDS_DATABASE, []),
+}
+
+
+def _affordable(funds: List[Mapping[str, Any]], investable_amount: float, limit: int) -> List[Mapping[str, Any]]:
+    """Return up to `limit` funds whose minimum investment fits the amount (0 means no limit)."""
+    selected = []
+    for fund in funds:
+        if len(selected) == limit:
+            break
+        if investable_amount == 0 or fund["min_investment"] <= investable_amount:
+            selected.append(fund)
+    return selected
+
+
+# Distinct minimum investments, ascending. Which funds an amount affords only
+# depends on the largest of these it covers, so that is what results are
+# cached by.
+_MIN_INVESTMENTS = sorted({f["min_investment"] for f in FUNDS_DATABASE})
+
+
+def _amount_bucket(investable_amount: float) -> float:
+    """Map an amount to the smallest one affording exactly the same funds."""
+    if investable_amount == 0:
+        # 0 means no limit
+        return 0
+    i = bisect_right(_MIN_INVESTMENTS, investable_amount)
+    # Below every minimum: an amount that affords nothing
+    return _MIN_INVESTMENTS[i - 1] if i else -1
+
+
+@lru_cache(maxsize=128)
+def _suggest(risk_profile: str, bucket: float) -> Tuple[Mapping[str, Any], ...]:
+    """Select the funds for a risk profile and amount bucket."""
+    preferred, diversifiers = _PROFILE_FUNDS.get(risk_profile, _PROFILE_FUNDS["medium"])
+    
+    # Limit to 5-6 funds
+    suggested = _affordable(preferred, bucket, MAX_SUGGESTIONS)
+    if len(suggested) < MAX_SUGGESTIONS:
+        suggested.extend(_affordable(diversifiers, bucket, 1))
+    return tuple(suggested)
+
+
+def get_funds_by_risk_profile(risk_profile: str, investable_amount: float = 0) -> List[Mapping[str, Any]]:
     """
     Get fund suggestions based on risk profile and investable amount.
     
@@ -116,59 +189,23 @@ def get_funds_by_risk_profile(risk_profile: str, investable_amount: float = 0) -
         investable_amount: Amount available for investment
         
     Returns:
-        List of suggested funds
+        List of suggested funds (read-only mappings shared with FUNDS_DATABASE)
     """
-    # Filter by minimum investment
-    available_funds = [
-        fund for fund in FUNDS_DATABASE
-        if investable_amount == 0 or fund["min_investment"] <= investable_amount
-    ]
-    
-    if risk_profile == "low":
-        # Prefer debt and hybrid funds
-        suggested = [
-            f for f in available_funds
-            if f["type"] in ["debt", "hybrid"] or f["risk_level"] == "low"
-        ]
-        # Add some equity for diversification
-        equity_funds = [f for f in available_funds if f["type"] == "equity"][:1]
-        suggested.extend(equity_funds)
-    elif risk_profile == "high":
-        # Prefer equity funds
-        suggested = [
-            f for f in available_funds
-            if f["type"] == "equity" or f["risk_level"] == "high"
-        ]
-        # Add some debt for stability
-        debt_funds = [f for f in available_funds if f["type"] == "debt"][:1]
-        suggested.extend(debt_funds)
-    else:  # medium
-        # Balanced mix
-        suggested = available_funds
-    
-    # Limit to 5-6 funds
-    return suggested[:6]
+    return list(_suggest(risk_profile, _amount_bucket(investable_amount)))
 
 
-def format_fund_suggestions(funds: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def format_fund_suggestions(funds: List[Mapping[str, Any]]) -> List[Mapping[str, Any]]:
     """
     Format fund suggestions for API response.
     
+    Fund records already carry exactly the response fields (name, type,
+    category, risk_level, min_investment, description) and are read-only,
+    so they are returned as-is instead of being copied.
+    
     Args:
-        funds: List of fund dictionaries
+        funds: List of fund records
         
     Returns:
         Formatted fund suggestions
     """
-    return [
-        {
-            "name": fund["name"],
-            "type": fund["type"],
-            "category": fund["category"],
-            "risk_level": fund["risk_level"],
-            "min_investment": fund["min_investment"],
-            "description": fund["description"]
-        }
-        for fund in funds
-    ]
-
+    return funds
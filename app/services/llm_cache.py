@@ -0,0 +1,209 @@
+"""Response cache for LLM calls with exact and optional semantic lookup."""
+import asyncio
+import logging
+import os
+import threading
+import orjson
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Semantic lookup needs FAISS and sentence-transformers, but make them optional
+try:
+    import faiss
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_AVAILABLE = True
+except ImportError:
+    SEMANTIC_AVAILABLE = False
+
+# Number of nearest neighbours checked against the guard on a semantic lookup
+_SEARCH_K = 5
+
+# Embedding model shared by every cache, loaded on first use
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """Load the sentence-transformers model once for the process."""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            _encoder = SentenceTransformer(settings.llm_cache_embedding_model)
+    return _encoder
+
+
+class LLMCache:
+    """
+    Cache of parsed LLM responses keyed by normalized input text.
+
+    Lookups try an exact match first, then (when FAISS and
+    sentence-transformers are installed) the most similar cached key whose
+    cosine similarity clears settings.llm_cache_similarity. Every entry also
+    carries a guard string that a semantic match must equal exactly; callers
+    put the parts of the input that must never be approximated there
+    (amounts, language, ...). Entries are appended to a JSONL file and
+    reloaded on startup; the FAISS index over them is rebuilt on the first
+    lookup so importing the cache does not load the embedding model.
+
+    The cache never fails a request: lookup errors count as misses and
+    store errors are dropped, both logged. If the embedding model or the
+    index fails, semantic lookup is turned off for the rest of the process.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the cache and load entries persisted by earlier runs.
+
+        Args:
+            name: Cache name, used for the file under settings.llm_cache_dir
+        """
+        self.path = Path(settings.llm_cache_dir) / f"{name}.jsonl"
+        self.semantic = SEMANTIC_AVAILABLE
+        self._lock = threading.Lock()
+        # (key, guard) -> serialized response
+        self._exact: Dict[Tuple[str, str], bytes] = {}
+        # Row i of the FAISS index belongs to _rows[i]
+        self._rows: List[Tuple[str, str]] = []
+        self._index = None
+        self._indexed = False
+        self._load()
+
+    def _embed(self, keys: List[str]):
+        """Embed keys as L2-normalized float32 vectors for inner-product search."""
+        vectors = _get_encoder().encode(keys, normalize_embeddings=True)
+        return np.asarray(vectors, dtype="float32")
+
+    def _add_vectors(self, keys: List[Tuple[str, str]]):
+        """Add (key, guard) rows to the FAISS index, creating it on first use."""
+        vectors = self._embed([key for key, _ in keys])
+        if self._index is None:
+            self._index = faiss.IndexFlatIP(vectors.shape[1])
+        self._index.add(vectors)
+        self._rows.extend(keys)
+
+    def _load(self):
+        """Rebuild the in-memory stores from the JSONL file."""
+        if not self.path.exists():
+            return
+
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = orjson.loads(line)
+                    self._exact[(entry["key"], entry["guard"])] = orjson.dumps(entry["value"])
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    # Skip a torn or malformed line rather than losing the cache
+                    continue
+
+    def _ensure_index(self):
+        """Embed the entries loaded from disk the first time the index is needed."""
+        if not self._indexed:
+            if self._exact:
+                self._add_vectors(list(self._exact))
+            self._indexed = True
+
+    def _search(self, key: str, guard: str) -> Optional[bytes]:
+        """Find the most similar cached key with the same guard."""
+        self._ensure_index()
+        if self._index is None:
+            return None
+        scores, ids = self._index.search(self._embed([key]), _SEARCH_K)
+        for score, i in zip(scores[0], ids[0]):
+            # Results are sorted by score, so stop at the first miss
+            if i < 0 or score < settings.llm_cache_similarity:
+                break
+            row = self._rows[i]
+            if row[1] == guard:
+                return self._exact[row]
+        return None
+
+    def _disable_semantic(self):
+        """Fall back to exact lookups after the encoder or index failed. Caller holds the lock."""
+        logger.exception("Semantic cache failed for %s; using exact matches only", self.path.name)
+        # A failed add can leave the index and _rows out of step, so drop both
+        self.semantic = False
+        self._index = None
+        self._rows = []
+
+    def get(self, key: str, guard: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Normalized input text
+            guard: Parts of the input a semantic match must equal exactly
+
+        Returns:
+            A fresh copy of the cached response, or None on a miss
+        """
+        if not settings.llm_cache_enabled:
+            return None
+
+        with self._lock:
+            cached = self._exact.get((key, guard))
+            if cached is None and self.semantic:
+                try:
+                    cached = self._search(key, guard)
+                except Exception:
+                    self._disable_semantic()
+
+        return orjson.loads(cached) if cached is not None else None
+
+    async def aget(self, key: str, guard: str = "") -> Optional[Dict[str, Any]]:
+        """Like get, but embeds in a worker thread so the event loop is not blocked."""
+        if self.semantic:
+            return await asyncio.to_thread(self.get, key, guard)
+        return self.get(key, guard)
+
+    def put(self, key: str, value: Dict[str, Any], guard: str = ""):
+        """
+        Store a response for later lookups and append it to the cache file.
+
+        Args:
+            key: Normalized input text
+            value: Parsed LLM response (must be JSON-serializable)
+            guard: Parts of the input a semantic match must equal exactly
+        """
+        if not settings.llm_cache_enabled:
+            return
+
+        try:
+            serialized = orjson.dumps(value)
+            line = orjson.dumps({"key": key, "guard": guard, "value": value}, option=orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            logger.exception("Not caching an unserializable response in %s", self.path.name)
+            return
+
+        with self._lock:
+            if (key, guard) in self._exact or len(self._exact) >= settings.llm_cache_max_entries:
+                return
+            if self.semantic:
+                try:
+                    # Index the entries from disk first so this one is not added twice
+                    self._ensure_index()
+                    self._add_vectors([(key, guard)])
+                except Exception:
+                    self._disable_semantic()
+            self._exact[(key, guard)] = serialized
+
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+            except OSError:
+                # Still cached for this process, just not persisted
+                logger.exception("Failed to persist an entry to %s", self.path)
+
+    async def aput(self, key: str, value: Dict[str, Any], guard: str = ""):
+        """Like put, but embeds in a worker thread so the event loop is not blocked."""
+        if self.semantic:
+            await asyncio.to_thread(self.put, key, value, guard)
+        else:
+            self.put(key, value, guard)
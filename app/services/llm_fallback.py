@@ -0,0 +1,53 @@
+"""Hedged Gemini-then-Ollama calls for the async services."""
+import asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+from app.config import settings
+
+T = TypeVar("T")
+
+
+async def hedged_call(
+    primary: Callable[[], Awaitable[Optional[T]]],
+    fallback: Callable[[], Awaitable[T]]
+) -> T:
+    """
+    Run primary, starting fallback alongside it if primary is slow.
+
+    primary returns None when it is unavailable or fails (as the Gemini
+    helpers do). If it has not answered within settings.llm_hedge_delay
+    seconds, fallback is started too and whichever succeeds first wins; the
+    other call is cancelled. Unlike a plain waterfall, a slow primary adds at
+    most the hedge delay to the fallback's latency instead of its full timeout.
+
+    Args:
+        primary: Coroutine factory for the preferred backend
+        fallback: Coroutine factory for the fallback backend
+
+    Returns:
+        The first successful result
+
+    Raises:
+        Exception: Whatever fallback raised, if primary also failed
+    """
+    primary_task = asyncio.create_task(primary())
+    fallback_task = None
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=settings.llm_hedge_delay)
+        if done:
+            result = primary_task.result()
+            return result if result is not None else await fallback()
+
+        fallback_task = asyncio.create_task(fallback())
+        pending = {primary_task, fallback_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if primary_task in done and primary_task.result() is not None:
+                return primary_task.result()
+            if fallback_task in done and fallback_task.exception() is None:
+                return fallback_task.result()
+        # Primary gave up and fallback raised
+        return fallback_task.result()
+    finally:
+        for task in (primary_task, fallback_task):
+            if task is not None and not task.done():
+                task.cancel()
@@ -0,0 +1,56 @@
+"""Shared pooled client for the Ollama API."""
+import httpx
+import orjson
+from typing import AsyncIterator, Dict, Any
+from app.config import settings
+from app.services._llm_json import aread_json_stream
+
+# One pooled client for every service. Capping connections at
+# ollama_num_parallel keeps the number of in-flight requests in line with
+# what the server decodes concurrently (OLLAMA_NUM_PARALLEL); extra requests
+# wait here for a free connection instead of queueing inside Ollama.
+_limits = httpx.Limits(
+    max_connections=settings.ollama_num_parallel,
+    max_keepalive_connections=settings.ollama_num_parallel
+)
+_client = httpx.AsyncClient(base_url=settings.ollama_url, timeout=60, limits=_limits)
+
+
+def _fragment(line: str) -> str:
+    """Pull the text out of one line of a streamed /api/generate response."""
+    chunk = orjson.loads(line)
+    if "error" in chunk:
+        raise Exception(f"Ollama API error: {chunk['error']}")
+    return chunk.get("response", "")
+
+
+async def _fragments(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield the generated text of a streamed response as it arrives."""
+    async for line in response.aiter_lines():
+        if line:
+            yield _fragment(line)
+
+
+async def generate_json(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Call Ollama's /api/generate endpoint, streaming the output and hanging up
+    as soon as the first JSON object in it is complete. Closing the stream
+    stops Ollama generating, so trailing chatter costs neither time nor
+    decode slots.
+
+    Args:
+        payload: Request body (model, prompt, format, ...); "stream" is
+            forced on
+
+    Returns:
+        Response body with the generated text so far under "response"
+
+    Raises:
+        httpx.HTTPError: If the request fails or returns an error status
+        Exception: If Ollama reports an error mid-stream
+    """
+    async with _client.stream("POST", "/api/generate", json={**payload, "stream": True}) as response:
+        response.raise_for_status()
+        text = await aread_json_stream(_fragments(response))
+    return {"response": text}
+
@@ -1,5 +1,17 @@
 """Strategist agent for creating safety net plans."""
-from typing import Dict, Any
+from types import MappingProxyType
+from typing import Dict, Any, Mapping
+
+# Liquid vs locked split (%) per risk profile. Shared and read-only: callers
+# get these objects as-is and must copy before mutating.
+_ALLOCATION_BY_RISK: Dict[str, Mapping[str, int]] = {
+    # Conservative: more locked, less liquid
+    "low": MappingProxyType({"liquid": 30, "locked": 70}),
+    # Balanced
+    "medium": MappingProxyType({"liquid": 50, "locked": 50}),
+    # Aggressive: more liquid, less locked
+    "high": MappingProxyType({"liquid": 70, "locked": 30}),
+}
 
 
 def create_safety_plan(
@@ -18,7 +30,7 @@ def create_safety_plan(
         - emergency_fund_goal (3 × average monthly expense)
         - months_to_reach_goal
         - monthly_savings_target
-        - allocation: { liquid: %, locked: % }
+        - allocation: { liquid: %, locked: % } (read-only mapping)
     """
     monthly_expenses = report.get("monthly_expenses", 0)
     saving_potential = report.get("saving_potential", 0)
@@ -38,26 +50,11 @@ def create_safety_plan(
         months_to_reach_goal = 0  # No goal to reach
     
     # Allocate liquid vs locked based on risk profile
-    if risk_profile == "low":
-        # Conservative: more locked, less liquid
-        liquid_percentage = 30
-        locked_percentage = 70
-    elif risk_profile == "high":
-        # Aggressive: more liquid, less locked
-        liquid_percentage = 70
-        locked_percentage = 30
-    else:  # medium
-        # Balanced
-        liquid_percentage = 50
-        locked_percentage = 50
+    allocation = _ALLOCATION_BY_RISK.get(risk_profile, _ALLOCATION_BY_RISK["medium"])
     
     return {
         "emergency_fund_goal": round(emergency_fund_goal, 2),
         "months_to_reach_goal": months_to_reach_goal,
         "monthly_savings_target": round(monthly_savings_target, 2),
-        "allocation": {
-            "liquid": liquid_percentage,
-            "locked": locked_percentage
-        }
+        "allocation": allocation
     }
-
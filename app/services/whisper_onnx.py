@@ -0,0 +1,106 @@
+"""Whisper on ONNX Runtime with an int8-quantized encoder and decoder."""
+import shutil
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+# ONNX Runtime, optimum and transformers are optional, so make them optional
+try:
+    import onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+    from transformers import WhisperProcessor
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Whisper's expected input sample rate
+SAMPLE_RATE = 16000
+
+
+def _export(model_id: str, model_dir: Path):
+    """
+    Export a Hugging Face Whisper checkpoint to ONNX and quantize it.
+
+    Every exported .onnx file (encoder and decoders) gets per-channel
+    dynamic int8 weights; configs and processor files are copied as-is.
+
+    Args:
+        model_id: Hugging Face model id (e.g. "openai/whisper-medium")
+        model_dir: Directory to write the quantized model to
+    """
+    export_dir = model_dir.with_name(model_dir.name + ".fp32")
+    ORTModelForSpeechSeq2Seq.from_pretrained(model_id, export=True).save_pretrained(export_dir)
+    WhisperProcessor.from_pretrained(model_id).save_pretrained(export_dir)
+
+    # Build in a scratch directory so an interrupted export is never loaded
+    tmp_dir = model_dir.with_name(model_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for path in export_dir.iterdir():
+        if path.suffix == ".onnx":
+            quantize_dynamic(
+                model_input=path,
+                model_output=tmp_dir / path.name,
+                weight_type=QuantType.QInt8,
+                per_channel=True
+            )
+        elif path.is_file() and not path.name.endswith(".onnx_data"):
+            shutil.copy2(path, tmp_dir / path.name)
+
+    tmp_dir.rename(model_dir)
+    shutil.rmtree(export_dir, ignore_errors=True)
+
+
+class OnnxWhisper:
+    """Quantized Whisper running on ONNX Runtime's CPU provider."""
+
+    def __init__(self, model_size: str, cache_dir: str, threads: int):
+        """
+        Load the quantized model, exporting it on first use.
+
+        Args:
+            model_size: Whisper model size (tiny, base, small, medium, ...)
+            cache_dir: Directory holding exported models
+            threads: Intra-op threads for inference
+
+        Raises:
+            ImportError: If onnxruntime/optimum/transformers are missing
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("onnxruntime, optimum and transformers are not installed")
+
+        model_id = model_size if "/" in model_size else f"openai/whisper-{model_size}"
+        model_dir = Path(cache_dir) / model_id.replace("/", "--")
+        if not model_dir.exists():
+            _export(model_id, model_dir)
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = threads
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.processor = WhisperProcessor.from_pretrained(model_dir)
+        self.model = ORTModelForSpeechSeq2Seq.from_pretrained(
+            model_dir,
+            provider="CPUExecutionProvider",
+            session_options=session_options
+        )
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str] = None) -> str:
+        """
+        Transcribe audio.
+
+        Only the first 30 seconds are transcribed (one Whisper window),
+        which covers chat voice notes.
+
+        Args:
+            audio: 16 kHz mono float32 samples
+            language: Spoken language code, or None to auto-detect
+
+        Returns:
+            Transcribed text, stripped
+        """
+        features = self.processor(audio, sampling_rate=SAMPLE_RATE, return_tensors="pt").input_features
+        generate_kwargs = {"language": language} if language else {}
+        token_ids = self.model.generate(features, **generate_kwargs)
+        return self.processor.batch_decode(token_ids, skip_special_tokens=True)[0].strip()
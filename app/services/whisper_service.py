@@ -1,9 +1,187 @@
 """Whisper service for audio transcription."""
+import asyncio
+import threading
 import whisper
+import numpy as np
+import torch
+import io
+import subprocess
 import tempfile
 import os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple
 from fastapi import UploadFile
 from app.config import settings
+from app.services.whisper_onnx import OnnxWhisper
+
+# faster-whisper (CTranslate2) is an optional, faster backend
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+# Silero VAD trims silence before the openai/onnx backends, but make it optional
+# (faster-whisper ships its own copy)
+try:
+    from silero_vad import collect_chunks, get_speech_timestamps, load_silero_vad
+    SILERO_AVAILABLE = True
+except ImportError:
+    SILERO_AVAILABLE = False
+
+# Greedy, single-pass decoding: chat messages are one short sentence, so
+# beam search, temperature fallback and cross-window conditioning only add
+# decoder work. openai-whisper's transcribe is greedy when beam_size is unset.
+_DECODE_OPTIONS = {"temperature": 0.0, "condition_on_previous_text": False, "no_speech_threshold": 0.6}
+_FASTER_DECODE_OPTIONS = {**_DECODE_OPTIONS, "beam_size": 1, "best_of": 1}
+
+# Audio formats accepted for transcription (uploads without an extension are
+# also accepted and left to ffmpeg to probe)
+ALLOWED_EXTENSIONS = frozenset({
+    ".mp3", ".wav", ".m4a", ".mp4", ".aac", ".ogg", ".oga", ".opus", ".webm", ".flac", ".amr"
+})
+
+
+class TranscriptionError(Exception):
+    """Audio could not be decoded or run through the model."""
+
+
+class EmptyTranscriptionError(ValueError):
+    """The audio contained no speech to transcribe."""
+
+
+# Fallback temp files go to RAM-backed /dev/shm when it is usable, so the
+# ffmpeg round-trip never touches the disk
+_TMPDIR = settings.whisper_tmp_dir or (
+    "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+)
+
+
+def _cpu_threads() -> int:
+    """Threads to run inference with: settings.whisper_threads, or every core this process may use."""
+    if settings.whisper_threads > 0:
+        return settings.whisper_threads
+    # Respects container CPU sets, unlike os.cpu_count()
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _quantize_dynamic(model: whisper.Whisper) -> whisper.Whisper:
+    """
+    Quantize the model's linear layers to int8 for CPU inference.
+    
+    Whisper's own Linear subclass only casts weights to the input dtype,
+    which is a no-op on CPU, but quantize_dynamic matches module types
+    exactly, so those layers are first retyped as plain nn.Linear.
+    
+    Args:
+        model: Loaded openai-whisper model on CPU
+    
+    Returns:
+        The quantized model
+    """
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _decode_audio(content: bytes) -> np.ndarray:
+    """
+    Decode audio bytes to 16 kHz mono float32 by piping them through ffmpeg,
+    the same conversion whisper.load_audio does for a file.
+    
+    Args:
+        content: Encoded audio file contents
+        
+    Returns:
+        Audio samples in [-1, 1]
+        
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg cannot decode the stream
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(whisper.audio.SAMPLE_RATE),
+        "-"
+    ]
+    out = subprocess.run(cmd, input=content, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+@contextmanager
+def _temp_audio_file(file_ext: str) -> Iterator[Tuple[int, str]]:
+    """Create a temporary audio file, yielding (fd, path); closed and deleted on exit."""
+    fd, path = tempfile.mkstemp(suffix=file_ext, dir=_TMPDIR)
+    try:
+        yield fd, path
+    finally:
+        os.close(fd)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _write_upload(fd: int, content: bytes, upload: BinaryIO):
+    """
+    Write an upload into a file descriptor with as few copies as possible.
+    
+    Uploads Starlette has spooled to disk are copied kernel-side with
+    sendfile; in-memory ones are written from the bytes already read.
+    
+    Args:
+        fd: Destination file descriptor, empty and at offset 0
+        content: The upload's full contents
+        upload: The uploaded file object
+    """
+    # A SpooledTemporaryFile only has a real fd once it has rolled to disk
+    # (calling fileno() before that would force the rollover)
+    if getattr(upload, "_rolled", True):
+        try:
+            src = upload.fileno()
+            size = os.fstat(src).st_size
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(fd, src, offset, size - offset)
+                if not sent:
+                    break
+                offset += sent
+            if offset == size:
+                return
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+        # Start over with a plain write
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+    
+    view = memoryview(content)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _decode_audio_file(content: bytes, upload: BinaryIO, file_ext: str) -> np.ndarray:
+    """
+    Decode an upload through a temporary file, for containers ffmpeg cannot
+    read from a pipe.
+    
+    Args:
+        content: The upload's full contents
+        upload: The uploaded file object
+        file_ext: Extension for the temporary file, as a format hint
+        
+    Returns:
+        Audio samples in [-1, 1]
+        
+    Raises:
+        RuntimeError: If ffmpeg cannot decode the file
+    """
+    with _temp_audio_file(file_ext) as (fd, path):
+        # Unbuffered writes, so ffmpeg sees everything without a flush
+        _write_upload(fd, content, upload)
+        return whisper.load_audio(path)
 
 
 class WhisperService:
@@ -13,20 +191,210 @@ class WhisperService:
         """Initialize Whisper model."""
         self.model = None
         self._initialized = False
+        # Half precision when the openai model runs on a GPU
+        self._fp16 = False
+        # Silero VAD model and the lock serializing it (it keeps state per call)
+        self._vad = None
+        self._vad_lock = threading.Lock()
+        # Only one thread loads the model; the others wait for it
+        self._lock = threading.Lock()
+        # Micro-batching queue of (audio, future) and its worker, created on
+        # first use inside the running event loop
+        self._batch_queue: Optional[asyncio.Queue] = None
+        self._batch_worker: Optional[asyncio.Task] = None
     
     def _ensure_initialized(self):
-        """Lazy initialization of Whisper model."""
-        if not self._initialized:
+        """Load the Whisper model if it is not loaded yet (once per process)."""
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
             try:
-                self.model = whisper.load_model(settings.whisper_model_size)
+                if settings.whisper_backend == "faster_whisper":
+                    if not FASTER_WHISPER_AVAILABLE:
+                        raise ImportError("faster-whisper is not installed")
+                    self.model = WhisperModel(
+                        settings.whisper_model_size,
+                        device=settings.whisper_device or "auto",
+                        compute_type=settings.whisper_compute_type,
+                        cpu_threads=_cpu_threads(),
+                        download_root=settings.whisper_cache_dir or None
+                    )
+                elif settings.whisper_backend == "onnx":
+                    self.model = OnnxWhisper(settings.whisper_model_size, settings.whisper_onnx_dir, _cpu_threads())
+                else:
+                    # in_memory reuses the bytes read for the checksum check
+                    # instead of reading the checkpoint a second time
+                    model = whisper.load_model(
+                        settings.whisper_model_size,
+                        device=settings.whisper_device or None,
+                        download_root=settings.whisper_cache_dir or None,
+                        in_memory=True
+                    )
+                    if model.device.type == "cpu":
+                        # PyTorch often defaults to fewer threads than the
+                        # container has cores; one inter-op thread is enough
+                        # since whisper runs one op at a time
+                        torch.set_num_threads(_cpu_threads())
+                        try:
+                            torch.set_num_interop_threads(1)
+                        except RuntimeError:
+                            pass  # Already fixed once parallel work has run
+                        if settings.whisper_compute_type.startswith("int8"):
+                            model = _quantize_dynamic(model)
+                    if settings.whisper_compile:
+                        # The encoder always sees a (n_mels, 3000) window, so
+                        # it compiles once; the decoder's KV-cache hooks and
+                        # growing inputs are left alone
+                        model.encoder = torch.compile(model.encoder)
+                    self._fp16 = model.device.type == "cuda"
+                    self.model = model
+                if settings.whisper_vad and settings.whisper_backend != "faster_whisper" and SILERO_AVAILABLE:
+                    self._vad = load_silero_vad()
                 self._initialized = True
             except Exception as e:
                 raise Exception(f"Failed to load Whisper model: {str(e)}")
     
-    def transcribe_audio(self, audio_file: UploadFile) -> str:
+    async def initialize(self):
+        """
+        Load the model at application startup so no request pays for it.
+        
+        Raises:
+            Exception: If the model cannot be loaded
+        """
+        await asyncio.to_thread(self._ensure_initialized)
+    
+    def _speech_only(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Cut silence out of the audio with Silero VAD, when it is loaded.
+        
+        Args:
+            audio: 16 kHz mono float32 samples
+            
+        Returns:
+            The speech segments joined together (empty if there is no speech)
+        """
+        if self._vad is None:
+            return audio
+        
+        samples = torch.from_numpy(audio)
+        with self._vad_lock:
+            speech = get_speech_timestamps(samples, self._vad, sampling_rate=whisper.audio.SAMPLE_RATE)
+        if not speech:
+            return audio[:0]
+        return collect_chunks(speech, samples).numpy()
+    
+    def _transcribe(self, audio: np.ndarray) -> str:
+        """Run the loaded backend on 16 kHz mono samples and return the stripped text."""
+        language = settings.whisper_language or None
+        if settings.whisper_backend == "faster_whisper":
+            # Segments are generated lazily as the audio is decoded
+            segments, _ = self.model.transcribe(
+                audio,
+                language=language,
+                vad_filter=settings.whisper_vad,
+                **_FASTER_DECODE_OPTIONS
+            )
+            return "".join(segment.text for segment in segments).strip()
+        if settings.whisper_backend == "onnx":
+            return self.model.transcribe(audio, language=language)
+        result = self.model.transcribe(audio, fp16=self._fp16, language=language, **_DECODE_OPTIONS)
+        return result.get("text", "").strip()
+    
+    def _transcribe_batch(self, audios: List[np.ndarray]) -> List[str]:
+        """
+        Transcribe several single-window clips with one batched encoder and
+        decoder pass (openai backend only).
+        
+        Args:
+            audios: 16 kHz mono float32 samples, each at most 30 seconds
+            
+        Returns:
+            Stripped text per clip, in order
+        """
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(audio)),
+                self.model.dims.n_mels,
+                device=self.model.device
+            )
+            for audio in audios
+        ])
+        options = whisper.DecodingOptions(
+            fp16=self._fp16,
+            language=settings.whisper_language or None,
+            temperature=_DECODE_OPTIONS["temperature"],
+            without_timestamps=True
+        )
+        texts = []
+        for result in whisper.decode(self.model, mels, options):
+            # Same silence rule transcribe() applies per segment
+            silent = result.no_speech_prob > _DECODE_OPTIONS["no_speech_threshold"] and result.avg_logprob < -1
+            texts.append("" if silent else result.text.strip())
+        return texts
+    
+    async def _run_batches(self, queue: asyncio.Queue):
+        """Collect queued clips for a short window and transcribe each group in one pass."""
+        loop = asyncio.get_running_loop()
+        window = settings.whisper_batch_window_ms / 1000
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + window
+            while len(batch) < settings.whisper_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Drop requests that were cancelled while waiting
+            batch = [(audio, future) for audio, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                texts = await asyncio.to_thread(self._transcribe_batch, [audio for audio, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), text in zip(batch, texts):
+                    if not future.done():
+                        future.set_result(text)
+    
+    async def _transcribe_batched(self, audio: np.ndarray) -> str:
+        """Queue a clip for the micro-batcher and wait for its text."""
+        loop = asyncio.get_running_loop()
+        if self._batch_worker is None or self._batch_worker.get_loop() is not loop or self._batch_worker.done():
+            self._batch_queue = asyncio.Queue()
+            self._batch_worker = loop.create_task(self._run_batches(self._batch_queue))
+        
+        future = loop.create_future()
+        await self._batch_queue.put((audio, future))
+        return await future
+    
+    def _load_upload(self, content: bytes, upload: BinaryIO, file_ext: str) -> np.ndarray:
+        """Decode an upload to samples and drop silence; blocking, so run it in a worker thread."""
+        # Decode in memory; some containers (e.g. MP4 with the index at
+        # the end) need a seekable input, so retry those from a file
+        try:
+            audio = _decode_audio(content)
+        except subprocess.CalledProcessError:
+            audio = _decode_audio_file(content, upload, file_ext)
+        return self._speech_only(audio)
+    
+    async def transcribe_audio(self, audio_file: UploadFile) -> str:
         """
         Transcribe audio file to text.
         
+        Decoding and inference run in a worker thread so the event loop
+        keeps serving other requests meanwhile. With the openai backend,
+        clips of up to 30 seconds that arrive together are transcribed in
+        one batch (settings.whisper_batch_size / whisper_batch_window_ms).
+        
         Args:
             audio_file: FastAPI UploadFile containing audio data
             
@@ -34,47 +402,65 @@ class WhisperService:
             Transcribed text string
             
         Raises:
-            Exception: If transcription fails
+            ValueError: If the upload is unusable (no filename, unsupported
+                format, too large, empty; EmptyTranscriptionError if it holds
+                no speech)
+            TranscriptionError: If decoding or the model fails
+            Exception: If the model cannot be loaded
         """
-        # Ensure model is loaded
-        self._ensure_initialized()
-        
-        # Validate file
+        # Validate file before reading the body or loading the model
         if not audio_file.filename:
             raise ValueError("Audio file must have a filename")
         
-        # Create temporary file to save audio
-        # Use appropriate extension based on file type
-        file_ext = os.path.splitext(audio_file.filename)[1] or ".mp3"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-            try:
-                # Read audio file content
-                content = audio_file.file.read()
-                if not content:
-                    raise ValueError("Audio file is empty")
-                
-                tmp_file.write(content)
-                tmp_file.flush()
-                
-                # Transcribe using Whisper
-                result = self.model.transcribe(tmp_file.name)
-                transcribed_text = result.get("text", "").strip()
-                
-                if not transcribed_text:
-                    raise ValueError("No text was transcribed from audio")
-                
-                return transcribed_text
-            except Exception as e:
-                raise Exception(f"Failed to transcribe audio: {str(e)}")
-            finally:
-                # Clean up temporary file
-                if os.path.exists(tmp_file.name):
-                    try:
-                        os.unlink(tmp_file.name)
-                    except OSError:
-                        pass  # Ignore cleanup errors
+        extension = os.path.splitext(audio_file.filename)[1].lower()
+        if extension and extension not in ALLOWED_EXTENSIONS:
+            raise ValueError(f"Unsupported audio format: {extension}")
+        if audio_file.size is not None and audio_file.size > settings.whisper_max_bytes:
+            raise ValueError(f"Audio file is larger than {settings.whisper_max_bytes} bytes")
+        
+        # Extension helps ffmpeg if the audio has to go through a file
+        file_ext = extension or ".mp3"
+        
+        # Normally loaded at startup; this only loads it if preloading was
+        # disabled or failed
+        if not self._initialized:
+            await self.initialize()
+        
+        # Read audio file content (one byte past the limit is enough to
+        # reject an upload whose size was not known up front)
+        content = await audio_file.read(settings.whisper_max_bytes + 1)
+        if not content:
+            raise ValueError("Audio file is empty")
+        if len(content) > settings.whisper_max_bytes:
+            raise ValueError(f"Audio file is larger than {settings.whisper_max_bytes} bytes")
+        
+        try:
+            audio = await asyncio.to_thread(self._load_upload, content, audio_file.file, file_ext)
+        except (RuntimeError, OSError) as e:
+            # ffmpeg failed or is missing
+            raise TranscriptionError(f"Failed to decode audio: {e}") from e
+        
+        # Transcribe using Whisper
+        try:
+            if not audio.size:
+                # Nothing but silence; don't let the model hallucinate a sentence
+                transcribed_text = ""
+            elif (
+                settings.whisper_backend == "openai"
+                and settings.whisper_batch_size > 1
+                and len(audio) <= whisper.audio.N_SAMPLES
+            ):
+                transcribed_text = await self._transcribe_batched(audio)
+            else:
+                transcribed_text = await asyncio.to_thread(self._transcribe, audio)
+        except RuntimeError as e:
+            raise TranscriptionError(f"Failed to transcribe audio: {e}") from e
+        
+        if not transcribed_text:
+            raise EmptyTranscriptionError("No text was transcribed from audio")
+        
+        return transcribed_text
 
 
 # Global instance
 whisper_service = WhisperService()
-
@@ -1,8 +1,9 @@
 """Script to create a test user in the database."""
-from app.db.db import init_db, create_user
+from app.db.db import init_db, db_initialized, create_user
 
-# Initialize database
-init_db()
+# Initialize database (only on the first run)
+if not db_initialized():
+    init_db()
 
 # Create test user
 user_data = {